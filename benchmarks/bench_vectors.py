@@ -0,0 +1,107 @@
+"""
+Benchmark the upload path representation of embeddings.
+
+Compares, per N chunks:
+- baseline: embeddings decoded from a JSON float list into Python lists, batches
+  serialized with the standard json module (what the SDK upload path did)
+- float32: embeddings decoded from base64 into NumPy float32 arrays, batches
+  serialized with orjson straight from the array buffers
+
+Each variant runs in its own process so peak RSS is comparable.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_vectors --chunks 10000
+"""
+import argparse
+import base64
+import json
+import multiprocessing
+import resource
+import time
+import uuid
+import numpy as np
+from src.utils.vectors import decode_embedding, encode_index_batch
+
+DIMENSIONS = 1536
+BATCH_SIZE = 100
+
+
+def _api_payloads(chunks: int, base64_encoded: bool):
+    """Yield embedding payloads shaped like the API responses, one chunk at a time."""
+    rng = np.random.default_rng(0)
+    for _ in range(chunks):
+        vector = rng.standard_normal(DIMENSIONS).astype(np.float32)
+        if base64_encoded:
+            yield base64.b64encode(vector.tobytes()).decode("ascii")
+        else:
+            yield json.dumps(vector.tolist())
+
+
+def _document(vector) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "textual_content": "x" * 2000,
+        "content_vector": vector,
+        "library": "default",
+        "created_date": "2025-01-01T00:00:00Z",
+        "title": "i - document: bench.pdf",
+        "source": "document_chunks",
+    }
+
+
+def _run(variant: str, chunks: int, queue) -> None:
+    base64_encoded = variant == "float32"
+    payloads = list(_api_payloads(chunks, base64_encoded))
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    cpu_start = time.process_time()
+    if base64_encoded:
+        documents = [_document(decode_embedding(payload)) for payload in payloads]
+    else:
+        documents = [_document(json.loads(payload)) for payload in payloads]
+    decode_cpu = time.process_time() - cpu_start
+
+    cpu_start = time.process_time()
+    body_bytes = 0
+    for i in range(0, len(documents), BATCH_SIZE):
+        batch = documents[i:i + BATCH_SIZE]
+        if base64_encoded:
+            body = encode_index_batch(batch)
+        else:
+            body = json.dumps({"value": [{"@search.action": "upload", **doc} for doc in batch]}).encode("utf-8")
+        body_bytes += len(body)
+    serialize_cpu = time.process_time() - cpu_start
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({
+        "variant": variant,
+        "decode_cpu_s": decode_cpu,
+        "serialize_cpu_s": serialize_cpu,
+        "rss_growth_mb": (rss_after - rss_before) / 1024,
+        "body_mb": body_bytes / 1024 / 1024,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10000)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for variant in ("baseline", "float32"):
+        queue = ctx.Queue()
+        process = ctx.Process(target=_run, args=(variant, args.chunks, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    print(f"{args.chunks} chunks x {DIMENSIONS} dimensions")
+    print(f"{'variant':<10} {'decode cpu s':>13} {'serialize cpu s':>16} {'rss growth MB':>14} {'body MB':>9}")
+    for r in results:
+        print(f"{r['variant']:<10} {r['decode_cpu_s']:>13.2f} {r['serialize_cpu_s']:>16.2f} "
+              f"{r['rss_growth_mb']:>14.1f} {r['body_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark vision OCR scheduling: one 200-DPI PNG per call (today's path) against
+adaptive resolution with multi-page batching of light pages.
+
+By default the pages are synthetic (a mix of dense text pages, sparse pages such as
+cover or signature pages, and near-blank pages) and the model is a local stand-in whose
+latency grows with image and output tokens, so the comparison runs offline. Pass
+--document to rasterize a real file, and --live to call Azure OpenAI from Settings.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_vision --pages 30
+    python -m benchmarks.bench_vision --document contract.pdf --live
+"""
+import argparse
+import base64
+import re
+import threading
+import time
+from io import BytesIO
+from PIL import Image, ImageDraw
+from src.utils.reader import process_document_images, estimate_image_tokens, content_density
+
+PAGE_SIZE = (1700, 2200)  # US letter at 200 DPI
+DATA_URL = re.compile(r"^data:image/\w+;base64,(.*)$", re.DOTALL)
+PAGE_LABEL = re.compile(r"^### PAGE (\d+)$")
+
+
+def synthetic_page(kind: str) -> str:
+    """Render a page as the extractor does (base64 PNG), with blocks standing in for text."""
+    img = Image.new("RGB", PAGE_SIZE, "white")
+    draw = ImageDraw.Draw(img)
+    if kind == "dense":
+        for y in range(150, PAGE_SIZE[1] - 150, 36):
+            draw.rectangle([150, y, PAGE_SIZE[0] - 150, y + 14], fill="black")
+    elif kind == "light":
+        # a title and a signature line
+        draw.rectangle([500, 300, 1200, 320], fill="black")
+        draw.rectangle([600, 1800, 1000, 1804], fill="black")
+    else:
+        draw.rectangle([800, 2050, 900, 2060], fill="black")
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def synthetic_document(pages: int):
+    kinds = ["dense", "dense", "light", "dense", "blank", "light"]
+    return [{"type": "image", "content": synthetic_page(kinds[i % len(kinds)])} for i in range(pages)]
+
+
+class SimulatedVisionService:
+    """
+    Stand-in for OpenAIService.invoke on vision requests. Latency is a fixed overhead
+    plus a cost per image token and per output token, where a page's output grows with
+    its content density; page labels are echoed back.
+    """
+
+    def __init__(self, overhead: float = 1.0, per_image_token: float = 0.0005, per_output_token: float = 0.01):
+        self.overhead = overhead
+        self.per_image_token = per_image_token
+        self.per_output_token = per_output_token
+        self.calls = 0
+        self.image_tokens = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, messages, max_tokens: int = 1000, **kwargs):
+        labels, tokens, output_tokens = [], 0, 0
+        for part in messages[-1]["content"]:
+            if part["type"] == "text" and PAGE_LABEL.match(part["text"]):
+                labels.append(part["text"])
+            elif part["type"] == "image_url":
+                raw = base64.b64decode(DATA_URL.match(part["image_url"]["url"]).group(1))
+                img = Image.open(BytesIO(raw))
+                tokens += estimate_image_tokens(img.width, img.height, part["image_url"].get("detail", "high"))
+                output_tokens += 20 + int(2000 * content_density(img))
+        with self.lock:
+            self.calls += 1
+            self.image_tokens += tokens
+        output_tokens = min(max_tokens, output_tokens)
+        time.sleep(self.overhead + tokens * self.per_image_token + output_tokens * self.per_output_token)
+        if labels:
+            return "\n".join(f"{label}\nextracted text" for label in labels)
+        return "extracted text"
+
+
+class CountingService:
+    """Wrap a real OpenAIService to count vision calls and estimated image tokens."""
+
+    def __init__(self, service):
+        self.service = service
+        self.calls = 0
+        self.image_tokens = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, messages, **kwargs):
+        tokens = 0
+        for part in messages[-1]["content"]:
+            if part["type"] == "image_url":
+                raw = base64.b64decode(DATA_URL.match(part["image_url"]["url"]).group(1))
+                width, height = Image.open(BytesIO(raw)).size
+                tokens += estimate_image_tokens(width, height, part["image_url"].get("detail", "high"))
+        with self.lock:
+            self.calls += 1
+            self.image_tokens += tokens
+        return self.service.invoke(messages, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=30, help="synthetic pages when no --document is given")
+    parser.add_argument("--document", help="rasterize this file in quality mode instead of synthetic pages")
+    parser.add_argument("--live", action="store_true", help="call Azure OpenAI instead of the local stand-in")
+    parser.add_argument("--workers", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.document:
+        from src.utils.extractor import process_document
+        document_content = process_document(file_path=args.document, processing_mode="quality")
+    else:
+        document_content = synthetic_document(args.pages)
+
+    if args.live:
+        from src.services import OpenAIService
+        from src.utils import Settings
+        openai_service = OpenAIService(sets=Settings())
+
+    print(f"{len(document_content)} pages, {args.workers} workers")
+    print(f"{'path':<22} {'calls':>6} {'image tokens':>13} {'wall s':>8}")
+    for label, adaptive in (("one page per call", False), ("adaptive + batching", True)):
+        service = CountingService(openai_service) if args.live else SimulatedVisionService()
+        start = time.perf_counter()
+        process_document_images(document_content=document_content,
+                                service=service,
+                                max_workers=args.workers,
+                                adaptive=adaptive)
+        wall = time.perf_counter() - start
+        print(f"{label:<22} {service.calls:>6} {service.image_tokens:>13} {wall:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Replay captured traffic against the API and report throughput, latency percentiles
+and error rates per endpoint.
+
+Capture traffic by setting TRAFFIC_CAPTURE_PATH on the server; each JSONL line records
+the arrival time, endpoint and request parameters of an /ask or /upload-document call
+(for uploads: size, index_name and processing_mode, not the document itself).
+
+Uploads write to an index, so they are only replayed with --upload-index, which names
+the target index for every replayed document (a plain-text document of the recorded
+size, sent with the recorded processing_mode). Without it upload events are skipped.
+Each replayed document carries a unique nonce, so identical recorded uploads are not
+deduplicated by the ingestion checkpoint and every one of them does the full work.
+
+Target:
+- --url: a running deployment (real services)
+- --local: start the app in-process with stand-in OpenAI and Search services that
+  simulate latency, so worker and admission settings can be sized offline
+
+Pacing:
+- --speed N: open loop, keeping the recorded inter-arrival times divided by N; latency
+  is measured from each request's scheduled send time, so client-side queueing counts
+- --concurrency N: closed loop, N requests in flight regardless of recorded timing
+
+Usage (from the repository root):
+    python -m benchmarks.replay traffic.jsonl --local --speed 4 --upload-index replay
+    python -m benchmarks.replay traffic.jsonl --url http://localhost:8000 --concurrency 16
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+import numpy as np
+import requests
+
+
+def load_events(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    events.sort(key=lambda event: event["ts"])
+    return events
+
+
+class StandInOpenAIService:
+    """Local stand-in for OpenAIService with fixed simulated latencies."""
+
+    def __init__(self, sets=None, completion_latency: float = 1.5, embedding_latency: float = 0.1):
+        from src.services.resilience import ResilienceLayer
+        self.completion_latency = completion_latency
+        self.embedding_latency = embedding_latency
+        self.resilience = ResilienceLayer()
+
+    def invoke(self, prompt, **kwargs):
+        time.sleep(self.completion_latency)
+        return "stand-in answer"
+
+    def embed(self, prompt):
+        time.sleep(self.embedding_latency)
+        return [np.random.default_rng().standard_normal(1536).astype(np.float32)]
+
+
+class StandInSearchService:
+    """Local stand-in for AzureSearchService with a fixed simulated latency."""
+
+    def __init__(self, embedding_model=None, sets=None, resilience=None, search_latency: float = 0.15):
+        self.embedding_model = embedding_model
+        self.resilience = resilience
+        self.search_latency = search_latency
+
+    def get_similar(self, index_name, query, top_k=5, filter=None, vector=None):
+        if vector is None:
+            vector = self.embedding_model.embed(query)[0]
+        time.sleep(self.search_latency)
+        return [{"id": f"{index_name}-{i}", "textual_content": "stand-in chunk"} for i in range(top_k)]
+
+    def upload_documents(self, index_name, documents, batch_size=100, completed_batches=None, on_batch_uploaded=None):
+        for i in range(0, len(documents), batch_size):
+            time.sleep(self.search_latency)
+            if on_batch_uploaded:
+                on_batch_uploaded(i // batch_size + 1)
+
+    def create_index(self, index_name, embedding_dimensions=1536, recreate_if_exists=False):
+        pass
+
+    def delete_index(self, index_name):
+        pass
+
+
+def start_local_server(port: int, workers_limit: int) -> str:
+    """Serve src.main:app in a background thread with the stand-in services."""
+    import src.services
+    src.services.OpenAIService = StandInOpenAIService
+    src.services.AzureSearchService = StandInSearchService
+
+    import anyio.to_thread
+    import uvicorn
+    from src.main import app
+
+    async def _size_threadpool():
+        # mirror the sync-endpoint threadpool size of a real worker
+        anyio.to_thread.current_default_thread_limiter().total_tokens = workers_limit
+
+    app.router.on_startup.append(_size_threadpool)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    url = f"http://127.0.0.1:{port}"
+    while not server.started:
+        time.sleep(0.05)
+    return url
+
+
+def send(session: requests.Session, url: str, event: dict, upload_index: str = None,
+         scheduled: float = None) -> dict:
+    """Send one recorded request; latency runs from `scheduled` (a perf_counter time) if given."""
+    start = time.perf_counter() if scheduled is None else scheduled
+    try:
+        if event["endpoint"] == "/ask":
+            resp = session.post(f"{url}/ask", json={
+                "question": event.get("question") or "replayed question",
+                "index_name": event.get("index_name") or "replay",
+                "top_k": event.get("top_k") or 5,
+            })
+        else:
+            # rebuild a plain-text document of the recorded size, unique to this request
+            nonce = uuid.uuid4().hex
+            size = max(len(nonce) + 1, event.get("file_size") or 1024)
+            content = (f"{nonce}\n".encode("ascii") + b"replayed document line\n" * (size // 23 + 1))[:size]
+            resp = session.post(f"{url}/upload-document",
+                                files={"file": (f"replay-{nonce}.txt", content, "text/plain")},
+                                data={"index_name": upload_index,
+                                      "processing_mode": event.get("processing_mode") or "normal"})
+        status = resp.status_code
+    except requests.RequestException:
+        status = None
+    return {"endpoint": event["endpoint"], "status": status, "latency": time.perf_counter() - start}
+
+
+def replay(url: str, events: list, speed: float = None, concurrency: int = None,
+           upload_index: str = None) -> Tuple[list, float]:
+    results = []
+    lock = threading.Lock()
+    local = threading.local()
+
+    def run(event, scheduled=None):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        result = send(local.session, url, event, upload_index=upload_index, scheduled=scheduled)
+        with lock:
+            results.append(result)
+
+    start = time.perf_counter()
+    if concurrency:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(run, events))
+    else:
+        origin = events[0]["ts"]
+        with ThreadPoolExecutor(max_workers=256) as executor:
+            for event in events:
+                # requests waiting for a free worker keep their scheduled time (no coordinated omission)
+                scheduled = start + (event["ts"] - origin) / speed
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(run, event, scheduled)
+    return results, time.perf_counter() - start
+
+
+def report(results: list, wall: float) -> None:
+    by_endpoint = defaultdict(list)
+    for result in results:
+        by_endpoint[result["endpoint"]].append(result)
+
+    print(f"{len(results)} requests in {wall:.1f} s")
+    print(f"{'endpoint':<18} {'count':>6} {'req/s':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'shed':>5} {'error %':>8}")
+    for endpoint, items in sorted(by_endpoint.items()):
+        latencies = np.array([item["latency"] for item in items]) * 1000
+        shed = sum(1 for item in items if item["status"] in (429, 503))
+        errors = sum(1 for item in items if item["status"] is None or item["status"] >= 400)
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        print(f"{endpoint:<18} {len(items):>6} {len(items) / wall:>7.2f} {p50:>8.0f} {p90:>8.0f} {p99:>8.0f} "
+              f"{errors:>7} {shed:>5} {100 * errors / len(items):>7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="JSONL file written by the traffic capture middleware")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="base URL of a running deployment")
+    target.add_argument("--local", action="store_true", help="run the app in-process with stand-in services")
+    pacing = parser.add_mutually_exclusive_group()
+    pacing.add_argument("--speed", type=float, default=1.0, help="replay at N times the recorded rate")
+    pacing.add_argument("--concurrency", type=int, help="closed loop with N requests in flight")
+    parser.add_argument("--upload-index", help="index receiving replayed uploads; uploads are skipped without it")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--threadpool", type=int, default=40, help="--local: worker threadpool size")
+    args = parser.parse_args()
+
+    endpoints = ("/ask", "/upload-document") if args.upload_index else ("/ask",)
+    events = load_events(args.capture)
+    skipped = sum(1 for event in events if event["endpoint"] == "/upload-document" and not args.upload_index)
+    events = [event for event in events if event["endpoint"] in endpoints]
+    if skipped:
+        print(f"Skipping {skipped} /upload-document events (pass --upload-index to replay them)")
+    if not events:
+        raise SystemExit(f"No {' or '.join(endpoints)} events in capture file.")
+
+    url = start_local_server(args.port, args.threadpool) if args.local else args.url.rstrip("/")
+    results, wall = replay(url, events, speed=args.speed, concurrency=args.concurrency,
+                           upload_index=args.upload_index)
+    report(results, wall)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,83 @@
 # function to search similar documents using AzureAI Search
+from typing import Dict, List, Union
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 from src.services import AzureSearchService
 from src.services import OpenAIService
+from src.models.models import MAX_QUERY_INDEXES
+from src.utils import Settings
 from src.utils.prompts import Prompts
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# Shared, bounded pool for multi-index searches, so concurrent /ask calls can't spawn
+# threads in proportion to the indexes they name. Admission control lets at most
+# `query_max_concurrency` questions run at once, each searching at most MAX_QUERY_INDEXES
+# indexes, so this size never queues a search and latency tracks the slowest index.
+_search_pool = ThreadPoolExecutor(max_workers=Settings().query_max_concurrency * MAX_QUERY_INDEXES,
+                                  thread_name_prefix="index-fanout")
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]],
+                           top_k: int,
+                           k: int = 60) -> List[Dict]:
+    """
+    Merge several ranked result lists with reciprocal rank fusion.
+
+    Each hit scores sum(1 / (k + rank)) over the lists it appears in, so a
+    chunk ranked well by several indexes floats to the top without needing
+    comparable raw search scores across indexes.
+    """
+    scores = {}
+    hits = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, start=1):
+            key = hit.get("id") or hit["textual_content"]
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            hits.setdefault(key, hit)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [hits[key] for key in ranked[:top_k]]
 
 def similar_search(azure_search_service: AzureSearchService,
                    query: str, 
-                   index_name: str, 
+                   index_name: Union[str, List[str]], 
                    top_k: int = 10):
     
-    results = azure_search_service.get_similar(index_name=index_name, 
-                                               query=query, 
-                                               top_k=top_k)
+    index_names = [index_name] if isinstance(index_name, str) else list(index_name)
+    if not index_names:
+        raise ValueError("At least one index name must be provided.")
+
+    if len(index_names) == 1:
+        results = azure_search_service.get_similar(index_name=index_names[0], 
+                                                   query=query, 
+                                                   top_k=top_k)
+    else:
+        # embed once and fan out the searches, so latency tracks the slowest index
+        vector = azure_search_service.embedding_model.embed(query)[0]
+        # copy the context so each search keeps the caller's request budget
+        futures = {
+            name: _search_pool.submit(contextvars.copy_context().run,
+                                      azure_search_service.get_similar,
+                                      index_name=name,
+                                      query=query,
+                                      top_k=top_k,
+                                      vector=vector)
+            for name in index_names
+        }
+        # fuse whatever succeeded; a missing or failing index shouldn't fail the question
+        result_lists = []
+        last_error = None
+        for name, future in futures.items():
+            try:
+                result_lists.append(future.result())
+            except Exception as e:
+                logger.warning(f"Search in index '{name}' failed, excluding it from the answer: {e}")
+                last_error = e
+        if not result_lists:
+            raise last_error
+        results = reciprocal_rank_fusion(result_lists, top_k=top_k)
+
     extracted_texts = [chunk["textual_content"] for chunk in results]
     full_text = " ".join(extracted_texts)
     return full_text
@@ -18,7 +85,7 @@ def similar_search(azure_search_service: AzureSearchService,
 def get_response(openai_service: OpenAIService,
                  azure_search_service: AzureSearchService,
                  query: str,
-                 index_name: str,
+                 index_name: Union[str, List[str]],
                  top_k: int = 10) -> str:
     similar_docs = similar_search(azure_search_service, 
                                   query, 
@@ -28,4 +95,4 @@ def get_response(openai_service: OpenAIService,
     # generate response based on similar context
     prompt = Prompts.final_response(similar_docs, query)
     response = openai_service.invoke(prompt)
-    return response
\ No newline at end of file
+    return response
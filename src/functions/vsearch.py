@@ -4,10 +4,18 @@ from src.services import OpenAIService
 from src.utils.extractor import process_document
 from src.utils.reader import process_document_images
 from src.utils.chunker import chunker
+from src.utils.checkpoint import IngestionCheckpoint, file_sha256, stream_sha256
+from src.utils.logging import setup_logger
 from datetime import datetime
+from typing import BinaryIO, Union
 import uuid
+import time
 import os
 
+logger = setup_logger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = "/tmp/ingestion_checkpoints"
+
 def create_index(index_name: str,
                  vector_dimension: int,
                  azure_search_service: AzureSearchService) -> None:
@@ -24,50 +32,98 @@ def delete_index(index_name: str,
     azure_search_service.delete_index(index_name=index_name)
 
 def upload_documents(index_name: str,
-                     document: str,
+                     document: Union[str, BinaryIO],
                      openai_service: OpenAIService,
                      azure_search_service: AzureSearchService,
                      processing_mode: str = "normal",
                      additional_information: str = None,
-                     library_name: str = None) -> None:
+                     library_name: str = None,
+                     checkpoint_dir: str = DEFAULT_CHECKPOINT_DIR,
+                     checkpoint_ttl_hours: float = 72.0,
+                     file_name: str = None,
+                     content_hash: str = None) -> None:
 
-    file_name = os.path.basename(document)
-    # Process and upload documents
-    # 1. extract text
-    processed_doc = process_document(file_path=document, processing_mode=processing_mode)
-    
-    if processing_mode == "normal":
-        full_text = " ".join(item["content"] for item in processed_doc)
+    # `document` is a file path or a binary stream (then `file_name` is required)
+    from_stream = not isinstance(document, str)
+    file_name = os.path.basename(file_name or document)
+    if content_hash is None:
+        content_hash = stream_sha256(document) if from_stream else file_sha256(document)
+
+    # Every stage output is checkpointed, so a retry of the same document with the
+    # same parameters resumes from the last completed unit instead of starting over.
+    IngestionCheckpoint.purge_stale(checkpoint_dir, checkpoint_ttl_hours * 3600)
+    checkpoint = IngestionCheckpoint(
+        checkpoint_dir,
+        IngestionCheckpoint.make_key(content_hash,
+                                     file_name=file_name,
+                                     index_name=index_name,
+                                     processing_mode=processing_mode,
+                                     additional_information=additional_information,
+                                     library_name=library_name)
+    )
 
-    else:
-        full_text = " "  
-        if additional_information:
-            images_text = process_document_images(document_content = processed_doc,
-                                                    service=openai_service, 
-                                                    document_informations=additional_information)
-        else:
-            images_text = process_document_images(document_content = processed_doc,
-                                                    service=openai_service, 
-                                                    document_informations=file_name)
-        full_text += " " + images_text
+    started = time.time()
+    with checkpoint.lock():
+        # A concurrent upload of the same document finished while we waited for the lock
+        if checkpoint.completed_since(started):
+            logger.info(f"'{file_name}' was already ingested into '{index_name}' by a concurrent upload; skipping")
+            return
 
-    # 2. chunk text
-    chunks = chunker(text=full_text, chunk_size=2000, overlap=200)
+        # Process and upload documents
+        chunks_state = checkpoint.load_chunks()
+        if chunks_state is None:
+            # 1. extract text
+            processed_doc = checkpoint.load_extracted()
+            if processed_doc is None:
+                if from_stream:
+                    processed_doc = process_document(stream=document, file_name=file_name, processing_mode=processing_mode)
+                else:
+                    processed_doc = process_document(file_path=document, processing_mode=processing_mode)
+                checkpoint.save_extracted(processed_doc)
+        
+            if processing_mode == "normal":
+                full_text = " ".join(item["content"] for item in processed_doc)
 
-    # 3. upload chunks
-    documents = []
-    for i, chunk in enumerate(chunks, start=1):
-        doc = {
-            "id": str(uuid.uuid4()),  # unique ID
-            "textual_content": chunk,
-            "content_vector": openai_service.embed(chunk)[0],
-            "library": library_name,
-            "created_date": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
-            "title": f"i - document: {file_name}",
-            "source": "document_chunks"
-        }
-        documents.append(doc)
+            else:
+                full_text = " "  
+                images_text = process_document_images(document_content = processed_doc,
+                                                      service=openai_service, 
+                                                      document_informations=additional_information or file_name,
+                                                      completed_pages=checkpoint.load_ocr(),
+                                                      on_page_done=checkpoint.save_ocr_page)
+                full_text += " " + images_text
+
+            # 2. chunk text
+            chunks = chunker(text=full_text, chunk_size=2000, overlap=200)
+            # ids and date are fixed here so re-uploaded batches overwrite instead of duplicating
+            chunks_state = {
+                "created_date": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+                "chunks": [{"id": str(uuid.uuid4()), "text": chunk} for chunk in chunks]
+            }
+            checkpoint.save_chunks(chunks_state)
+
+        # 3. embed and upload chunks
+        documents = []
+        for i, chunk in enumerate(chunks_state["chunks"], start=1):
+            vector = checkpoint.load_embedding(i)
+            if vector is None:
+                vector = openai_service.embed(chunk["text"])[0]
+                checkpoint.save_embedding(i, vector)
+            doc = {
+                "id": chunk["id"],  # unique ID
+                "textual_content": chunk["text"],
+                "content_vector": vector,
+                "library": library_name,
+                "created_date": chunks_state["created_date"],
+                "title": f"i - document: {file_name}",
+                "source": "document_chunks"
+            }
+            documents.append(doc)
 
         azure_search_service.upload_documents(index_name=index_name, 
                                               documents=documents, 
-                                              batch_size=100)
\ No newline at end of file
+                                              batch_size=100,
+                                              completed_batches=checkpoint.load_uploaded_batches(),
+                                              on_batch_uploaded=checkpoint.mark_batch_uploaded)
+
+        checkpoint.mark_completed()
@@ -1,12 +1,17 @@
 from functools import lru_cache
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
+from fastapi.responses import JSONResponse
 from typing import Optional
 from src.models.models import QuestionRequest, CreateIndexRequest, DeleteIndexRequest
 from src.functions import get_response, create_index, upload_documents, delete_index
 from src.services import AzureSearchService, OpenAIService
 from src.utils import Settings
-import shutil
-import os
+from src.utils.admission import AdmissionController, AdmissionRejected
+from src.services.resilience import request_budget
+from src.utils.checkpoint import DocumentTooLargeError, stream_sha256
+from src.utils.traffic import TrafficRecorder
+import json
+import time
 
 app = FastAPI(title="Document Q&A API")
 
@@ -15,22 +20,113 @@ app = FastAPI(title="Document Q&A API")
 def get_services():
     sets = Settings()
     openai_service = OpenAIService(sets=sets)
-    azure_search_service = AzureSearchService(embedding_model=openai_service, sets=sets)
+    azure_search_service = AzureSearchService(embedding_model=openai_service,
+                                              sets=sets,
+                                              resilience=openai_service.resilience)
     return openai_service, azure_search_service
 
 openai_service, azure_search_service = get_services()
+settings = Settings()
+
+# Admission control: keep /ask latency stable while uploads are running
+@lru_cache(maxsize=1)
+def get_admission_controller():
+    sets = Settings()
+    return AdmissionController(
+        query_concurrency=sets.query_max_concurrency,
+        query_queue=sets.query_max_queue,
+        query_max_wait=sets.query_max_wait_seconds,
+        ingestion_concurrency=sets.ingestion_max_concurrency,
+        ingestion_queue=sets.ingestion_max_queue,
+        ingestion_max_wait=sets.ingestion_max_wait_seconds
+    )
+
+admission_controller = get_admission_controller()
+ADMISSION_LANES = {
+    "/ask": AdmissionController.QUERY,
+    "/upload-document": AdmissionController.INGESTION,
+}
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    lane = ADMISSION_LANES.get(request.url.path)
+    if lane is None:
+        return await call_next(request)
+    # Reject oversized uploads from their Content-Length, before the body is received
+    if lane == AdmissionController.INGESTION:
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > settings.max_upload_bytes:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Document exceeds the {settings.max_upload_bytes} bytes limit."}
+            )
+    try:
+        await admission_controller.acquire(lane)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    try:
+        return await call_next(request)
+    finally:
+        await admission_controller.release(lane)
+
+# Traffic capture: opt-in via TRAFFIC_CAPTURE_PATH, replayed with `python -m benchmarks.replay`.
+# Registered after admission control so it wraps it and also records shed requests.
+traffic_recorder = TrafficRecorder(settings.traffic_capture_path) if settings.traffic_capture_path else None
+CAPTURED_PATHS = ("/ask", "/upload-document")
+
+@app.middleware("http")
+async def capture_traffic(request: Request, call_next):
+    if traffic_recorder is None or request.url.path not in CAPTURED_PATHS:
+        return await call_next(request)
+
+    event = {"ts": time.time(), "endpoint": request.url.path}
+    if request.url.path == "/ask":
+        try:
+            body = json.loads(await request.body())
+            event.update({key: body.get(key) for key in ("question", "index_name", "top_k")})
+        except (ValueError, AttributeError):
+            pass
+    else:
+        # the multipart body is left unread here; its length approximates the file size
+        # and the form fields are filled in by the endpoint once it has parsed them
+        event["file_size"] = int(request.headers.get("content-length", 0))
+
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        event.update(getattr(request.state, "captured_fields", {}))
+        event["status"] = status
+        event["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        traffic_recorder.record(event)
+
+@app.get("/admission-metrics")
+def api_admission_metrics():
+    return admission_controller.metrics()
+
+@app.get("/resilience-metrics")
+def api_resilience_metrics():
+    return openai_service.resilience.stats()
 
 # API endpoint
 @app.post("/ask")
 def ask_question(request: QuestionRequest):
     try:
-        response = get_response(
-            openai_service=openai_service,
-            azure_search_service=azure_search_service,
-            query=request.question,
-            index_name=request.index_name,
-            top_k=request.top_k
-        )
+        with request_budget(settings.ask_request_budget_seconds):
+            response = get_response(
+                openai_service=openai_service,
+                azure_search_service=azure_search_service,
+                query=request.question,
+                index_name=request.index_name,
+                top_k=request.top_k
+            )
         return {"question": request.question, "answer": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -60,32 +156,40 @@ def api_delete_index(request: DeleteIndexRequest):
 
 @app.post("/upload-document")
 def api_upload_document(
+    request: Request,
     file: UploadFile = File(...),
     index_name: str = Form(...),
     processing_mode: str = Form("normal"),
     additional_information: Optional[str] = Form(None),
     library_name: Optional[str] = Form("default")
 ):
+    # picked up by the traffic capture middleware
+    request.state.captured_fields = {"index_name": index_name, "processing_mode": processing_mode}
     try:
-        # Save uploaded file temporarily
-        temp_path = f"/tmp/{file.filename}"
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Hash in one pass over the upload buffer Starlette spooled (to disk above 1 MB);
+        # also enforces the size limit for requests sent without a Content-Length
+        try:
+            content_hash = stream_sha256(file.file, max_bytes=settings.max_upload_bytes)
+        except DocumentTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
 
         # Upload document
         upload_documents(
             index_name=index_name,
-            document=temp_path,
+            document=file.file,
             openai_service=openai_service,
             azure_search_service=azure_search_service,
             processing_mode=processing_mode,
             additional_information=additional_information,
-            library_name=library_name
+            library_name=library_name,
+            checkpoint_dir=settings.ingestion_checkpoint_dir,
+            checkpoint_ttl_hours=settings.ingestion_checkpoint_ttl_hours,
+            file_name=file.filename,
+            content_hash=content_hash
         )
 
-        # Remove temporary file
-        os.remove(temp_path)
-
         return {"status": "success", "file_name": file.filename, "index_name": index_name}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,9 +1,13 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional, Union
+from typing_extensions import Annotated
+
+# Upper bound on the indexes a single /ask may fan out to
+MAX_QUERY_INDEXES = 16
 
 class QuestionRequest(BaseModel):
     question: str
-    index_name: str
+    index_name: Union[str, Annotated[List[str], Field(min_length=1, max_length=MAX_QUERY_INDEXES)]]
     top_k: int = 5
 
 class CreateIndexRequest(BaseModel):
@@ -1,6 +1,18 @@
+from azure.core import PipelineClient
 from azure.core.credentials import AzureKeyCredential
 from azure.core.exceptions import HttpResponseError
+from azure.core.pipeline.policies import (
+    ContentDecodePolicy,
+    DistributedTracingPolicy,
+    HeadersPolicy,
+    HttpLoggingPolicy,
+    RequestIdPolicy,
+    RetryPolicy,
+    UserAgentPolicy
+)
+from azure.core.rest import HttpRequest
 from azure.search.documents import SearchClient
+from azure.search.documents._version import SDK_MONIKER
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents.indexes.models import (
     SearchIndex,
@@ -14,17 +26,44 @@ from azure.search.documents.indexes.models import (
 )
 from src.utils import Settings
 from src.utils.logging import setup_logger
+from src.services.resilience import ResilienceLayer
+from src.utils.vectors import encode_index_batch
+import orjson
+import time
 
 logger = setup_logger(__name__)
 
+SEARCH_API_VERSION = "2023-11-01"
+# Retries of documents the service rejected inside an otherwise successful (207) batch
+INDEX_ITEM_RETRIES = 3
+INDEX_ITEM_RETRY_BACKOFF = 1.0
+
 class AzureSearchService:
     def __init__(self, 
                  embedding_model, 
-                 sets: Settings):
+                 sets: Settings,
+                 resilience: ResilienceLayer = None):
         self.embedding_model = embedding_model
         self.azai_url = sets.azure_ai_search_endpoint
         self.azai_key = sets.azure_ai_search_key
         self.credential = AzureKeyCredential(self.azai_key)
+        self.search_timeout = sets.search_timeout_seconds
+        # same policies as the SDK's SearchClient pipeline: retries on 408/429/5xx
+        # (honouring Retry-After), api-key header and user agent
+        self.pipeline_client = PipelineClient(
+            base_url=self.azai_url,
+            policies=[
+                RequestIdPolicy(),
+                HeadersPolicy({"api-key": self.azai_key}),
+                UserAgentPolicy(sdk_moniker=SDK_MONIKER),
+                RetryPolicy(),
+                ContentDecodePolicy(),
+                DistributedTracingPolicy(),
+                HttpLoggingPolicy()
+            ]
+        )
+        self.resilience = resilience or ResilienceLayer(failure_threshold=sets.breaker_failure_threshold,
+                                                        reset_timeout=sets.breaker_reset_seconds)
 
     def delete_index(self, index_name: str):
         logger.info(f"Deleting index '{index_name}'...")
@@ -106,51 +145,119 @@ class AzureSearchService:
         logger.info(f"Index '{result.name}' operation completed successfully")
         return result
 
-    def upload_documents(self, index_name: str, documents: list, batch_size: int = 100):
+    def _index_batch(self, index_name: str, batch: list, attempt: int = 0) -> int:
+        """
+        Send one batch to `docs/search.index`, serialized with orjson straight from the
+        float32 vector buffers (the SDK would box every vector component first).
+        Splits the batch in half when the service answers 413, like the SDK does.
+        Documents rejected individually (e.g. throttled inside a 207) are resent on their
+        own; if some still fail after INDEX_ITEM_RETRIES, the batch raises, so it is never
+        reported as uploaded while documents are missing.
+        """
+        request = HttpRequest(
+            "POST",
+            f"{self.azai_url.rstrip('/')}/indexes('{index_name}')/docs/search.index",
+            params={"api-version": SEARCH_API_VERSION},
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json;odata.metadata=none",
+            },
+            content=encode_index_batch(batch),
+        )
+        response = self.pipeline_client.send_request(request,
+                                                     connection_timeout=self.search_timeout)
+
+        if response.status_code == 413 and len(batch) > 1:
+            half = len(batch) // 2
+            return self._index_batch(index_name, batch[:half]) + self._index_batch(index_name, batch[half:])
+        if response.status_code not in (200, 207):
+            raise HttpResponseError(response=response)
+
+        results = orjson.loads(response.content)["value"]
+        failed = {item["key"]: item for item in results if not item.get("status")}
+        if not failed:
+            return len(results)
+
+        if attempt >= INDEX_ITEM_RETRIES:
+            for item in failed.values():
+                logger.error(f"Document '{item['key']}' failed: {item.get('errorMessage')}")
+            raise RuntimeError(f"{len(failed)} documents failed to index in '{index_name}' "
+                               f"after {INDEX_ITEM_RETRIES} retries")
+
+        logger.warning(f"{len(failed)} documents rejected by '{index_name}', retrying them")
+        time.sleep(INDEX_ITEM_RETRY_BACKOFF * (2 ** attempt))
+        retry = [doc for doc in batch if doc["id"] in failed]
+        return len(results) - len(failed) + self._index_batch(index_name, retry, attempt + 1)
+
+    def upload_documents(self, 
+                         index_name: str, 
+                         documents: list, 
+                         batch_size: int = 100,
+                         completed_batches: set = None,
+                         on_batch_uploaded=None):
+        """
+        Upload documents in batches. Batches whose 1-based number is in `completed_batches`
+        are skipped; `on_batch_uploaded(batch_number)` is called after each confirmed batch.
+        """
         logger.info(f"Uploading documents to index '{index_name}'...")
-        
-        search_client = SearchClient(endpoint=self.azai_url, 
-                                   index_name=index_name, 
-                                   credential=self.credential)
+        completed_batches = completed_batches or set()
         
         for i in range(0, len(documents), batch_size):
+            batch_number = i//batch_size + 1
+            if batch_number in completed_batches:
+                logger.info(f"Skipping batch {batch_number}: already uploaded")
+                continue
             batch = documents[i:i + batch_size]
             try:
-                result = search_client.upload_documents(documents=batch)
-                logger.info(f"Uploaded batch {i//batch_size + 1}: {len(result)} documents")
+                uploaded = self._index_batch(index_name, batch)
+                logger.info(f"Uploaded batch {batch_number}: {uploaded} documents")
             except Exception as e:
-                logger.error(f"Error uploading batch {i//batch_size + 1}: {str(e)}")
+                logger.error(f"Error uploading batch {batch_number}: {str(e)}")
                 raise
+            if on_batch_uploaded:
+                on_batch_uploaded(batch_number)
         
         logger.info(f"Successfully uploaded {len(documents)} documents")
 
-    def get_similar(self, index_name: str, query: str, top_k: int = 5, filter: str = None):
+    def get_similar(self, index_name: str, query: str, top_k: int = 5, filter: str = None, vector: list = None):
         logger.info(f"Searching in index '{index_name}' for: {query}")
         
+        # retries are left to the resilience layer, within the request budget
         search_client = SearchClient(endpoint=self.azai_url, 
                                 index_name=index_name, 
-                                credential=self.credential)
-        
-        vector = self.embedding_model.embed(query)[0]
-        results = search_client.search(
-            search_text=query,
-            vector_queries=[
-                {
-                    "vector": vector,
-                    "fields": "content_vector",
-                    "k": top_k,
-                    "kind": "vector",
-                    "exhaustive": True
-                }
-            ],
-            top=top_k,
-            filter=filter,
-            select=["id", 
-                    "textual_content", 
-                    "title", 
-                    "library", 
-                    "source", 
-                    "created_date"]
-        )
+                                credential=self.credential,
+                                retry_total=0)
         
-        return list(results)
\ No newline at end of file
+        if vector is None:
+            vector = self.embedding_model.embed(query)[0]
+
+        def _call(endpoint: str, timeout: float):
+            results = search_client.search(
+                search_text=query,
+                vector_queries=[
+                    {
+                        "vector": list(map(float, vector)),
+                        "fields": "content_vector",
+                        "k": top_k,
+                        "kind": "vector",
+                        "exhaustive": True
+                    }
+                ],
+                top=top_k,
+                filter=filter,
+                select=["id", 
+                        "textual_content", 
+                        "title", 
+                        "library", 
+                        "source", 
+                        "created_date"],
+                timeout=timeout,
+                connection_timeout=timeout,
+                read_timeout=timeout
+            )
+            # results are paged lazily, so materialize them inside the deadline
+            return list(results)
+
+        # search is read-only, so it is safe to hedge
+        return self.resilience.call("search", [self.azai_url], _call,
+                                    default_timeout=self.search_timeout, hedge=True)
\ No newline at end of file
@@ -1,6 +1,9 @@
 from openai import AzureOpenAI, AsyncAzureOpenAI
 from typing import Any, Dict, List, Union
+import numpy as np
 from src.utils import Settings
+from src.utils.vectors import decode_embedding
+from src.services.resilience import ResilienceLayer
 from openai.types.chat.chat_completion_message import ChatCompletionMessage
 
 
@@ -13,6 +16,10 @@ class OpenAIService:
     - async_invoke: asynchronous chat model call.
     - embed: synchronous embeddings generation.
     - async_embed: asynchronous embeddings generation.
+
+    All calls go through a ResilienceLayer: per-call deadlines capped by the request
+    budget, circuit breakers per deployment with failover to the fallback deployments
+    from Settings, and hedging for embeddings (which are idempotent).
     """
 
     def __init__(self, 
@@ -21,18 +28,26 @@ class OpenAIService:
                  max_retries: int = 2):
         """
         Initialize the Azure OpenAI clients (sync and async).
+        `max_retries` is applied by the resilience layer, so retries stay within the
+        request budget and can fail over; the SDK clients themselves never retry.
         """
         self.common_args = {
             "api_key": sets.azure_openai_api_key,
             "azure_endpoint": sets.azure_openai_endpoint,
             "api_version": sets.llm_api_version,
             "timeout": timeout,
-            "max_retries": max_retries,
+            "max_retries": 0,
         }
+        self.timeout = timeout
         self.llm_deployment = sets.llm_deployment_model
         self.embedding_deployment = sets.embedding_deployment_model
+        self.llm_deployments = [sets.llm_deployment_model, sets.llm_fallback_deployment_model]
+        self.embedding_deployments = [sets.embedding_deployment_model, sets.embedding_fallback_deployment_model]
         self.sync_client = AzureOpenAI(**self.common_args)
         self.async_client = AsyncAzureOpenAI(**self.common_args)
+        self.resilience = ResilienceLayer(failure_threshold=sets.breaker_failure_threshold,
+                                          reset_timeout=sets.breaker_reset_seconds,
+                                          max_retries=max_retries)
 
     def _prepare_messages(self, prompt: Union[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
         """
@@ -54,11 +69,17 @@ class OpenAIService:
         Synchronous call to the chat model.
         """
         messages = self._prepare_messages(prompt)
-        response = self.sync_client.chat.completions.create(
-            model=self.llm_deployment,
-            messages=messages,
-            **kwargs
-        )
+
+        def _call(deployment: str, timeout: float):
+            return self.sync_client.chat.completions.create(
+                model=deployment,
+                messages=messages,
+                timeout=timeout,
+                **kwargs
+            )
+
+        response = self.resilience.call("invoke", self.llm_deployments, _call,
+                                        default_timeout=self.timeout)
         return response.choices[0].message.content
 
     async def ainvoke(self, 
@@ -68,31 +89,49 @@ class OpenAIService:
         Asynchronous call to the chat model.
         """
         messages = self._prepare_messages(prompt)
-        response = await self.async_client.chat.completions.create(
-            model=self.llm_deployment,
-            messages=messages,
-            **kwargs
-        )
+
+        def _call(deployment: str, timeout: float):
+            return self.async_client.chat.completions.create(
+                model=deployment,
+                messages=messages,
+                timeout=timeout,
+                **kwargs
+            )
+
+        response = await self.resilience.acall("ainvoke", self.llm_deployments, _call,
+                                               default_timeout=self.timeout)
         return response.choices[0].message.content
 
-    def embed(self, prompt: str) -> List[List[float]]:
+    def embed(self, prompt: str) -> List[np.ndarray]:
         """
         Generate embeddings synchronously.
-        Returns a list of embeddings (one per input).
+        Returns a list of float32 arrays (one per input), decoded from base64.
         """
-        response = self.sync_client.embeddings.create(
-            model=self.embedding_deployment,
-            input=prompt
-        )
-        return [item.embedding for item in response.data]
+        def _call(deployment: str, timeout: float):
+            return self.sync_client.embeddings.create(
+                model=deployment,
+                input=prompt,
+                encoding_format="base64",
+                timeout=timeout
+            )
+
+        response = self.resilience.call("embed", self.embedding_deployments, _call,
+                                        default_timeout=self.timeout, hedge=True)
+        return [decode_embedding(item.embedding) for item in response.data]
 
-    async def aembed(self, prompt: str) -> List[List[float]]:
+    async def aembed(self, prompt: str) -> List[np.ndarray]:
         """
         Generate embeddings asynchronously.
-        Returns a list of embeddings (one per input).
+        Returns a list of float32 arrays (one per input), decoded from base64.
         """
-        response = await self.async_client.embeddings.create(
-            model=self.embedding_deployment,
-            input=prompt
-        )
-        return [item.embedding for item in response.data]
\ No newline at end of file
+        def _call(deployment: str, timeout: float):
+            return self.async_client.embeddings.create(
+                model=deployment,
+                input=prompt,
+                encoding_format="base64",
+                timeout=timeout
+            )
+
+        response = await self.resilience.acall("aembed", self.embedding_deployments, _call,
+                                               default_timeout=self.timeout, hedge=True)
+        return [decode_embedding(item.embedding) for item in response.data]
\ No newline at end of file
@@ -0,0 +1,512 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+from openai import APIConnectionError
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+# Absolute monotonic deadline of the request currently being served (if any)
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class CircuitOpenError(Exception):
+    """Raised when every candidate deployment has an open circuit breaker."""
+
+
+class BudgetExhaustedError(TimeoutError):
+    """Raised when the request budget is spent before an external call starts."""
+
+
+@contextmanager
+def request_budget(seconds: float):
+    """
+    Set an end-to-end time budget for the calls made inside the block.
+    Per-call timeouts are capped to whatever is left of it.
+    """
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current request budget, or None when no budget is set."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+# Errors that say nothing about the request itself: the deployment is slow, unreachable
+# or overloaded. These trigger retries or failover; all but throttling count against a breaker.
+TRANSIENT_ERRORS = (TimeoutError, ConnectionError, APIConnectionError, ServiceRequestError, ServiceResponseError)
+TRANSIENT_STATUS_CODES = {408, 429}
+THROTTLED_STATUS_CODE = 429
+
+# Upper bound on a server-requested retry delay when no request budget applies (ingestion)
+MAX_RETRY_AFTER = 60.0
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for timeouts, connection errors, 408/429 and 5xx responses."""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status in TRANSIENT_STATUS_CODES or status >= 500)
+
+
+def is_throttled(error: BaseException) -> bool:
+    """
+    True for 429 responses. The deployment is healthy but over its quota (often because of
+    bulk ingestion), so throttling is retried after Retry-After instead of opening a breaker.
+    """
+    return getattr(error, "status_code", None) == THROTTLED_STATUS_CODE
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Delay in seconds requested by a throttled response's retry-after headers, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for name, unit in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * unit)
+        except ValueError:
+            pass
+        try:
+            # Retry-After may also be an HTTP date
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def call_timeout(default: float) -> float:
+    """Per-call deadline: the default timeout capped by the remaining request budget."""
+    remaining = remaining_budget()
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise BudgetExhaustedError("Request budget exhausted before external call.")
+    return min(default, remaining)
+
+
+class LatencyTracker:
+    """Rolling window of call latencies used to derive the hedge delay."""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self.lock:
+            if not self.samples:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker for a single deployment.
+
+    - closed: calls flow; `failure_threshold` consecutive failures open the circuit.
+    - open: calls fail fast until `reset_timeout` seconds have passed.
+    - half_open: a single trial call is let through; success closes, failure re-opens.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.rejections = 0
+        self.throttles = 0
+        self.times_opened = 0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            self.rejections += 1
+            return False
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+            self.state = self.CLOSED
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial that ended without a success or failure verdict."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_throttled(self) -> None:
+        """Count a throttled call; it neither closes nor opens the circuit."""
+        with self.lock:
+            self.throttles += 1
+            self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                    logger.warning(f"Circuit for '{self.name}' opened after {self.consecutive_failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejections": self.rejections,
+                "throttles": self.throttles,
+                "times_opened": self.times_opened,
+            }
+
+
+class ResilienceLayer:
+    """
+    Deadlines, hedging and circuit breaking for external calls.
+
+    Main methods:
+    - call: run a sync call against a list of deployments (primary first, then fallbacks).
+    - acall: async variant of `call`.
+    - stats: hedge and breaker statistics.
+
+    Hedging only applies to idempotent operations (embeddings, search): when the first
+    attempt is still running after the operation's p95 latency, a second identical
+    attempt is started and whichever finishes first wins.
+
+    Transient errors (see `is_transient`) are retried on the next deployment and then in
+    up to `max_retries` further passes, within the request budget. They count against
+    breakers, except throttling (429): a pass after a throttled attempt waits at least the
+    requested Retry-After, and gives up at once if that is longer than the remaining budget.
+    Anything else (bad request, content filter, ...) is raised as is.
+    The layer owns retries, so the SDK clients it drives should not retry on their own.
+    """
+
+    def __init__(self,
+                 failure_threshold: int = 5,
+                 reset_timeout: float = 30.0,
+                 hedge_percentile: float = 95.0,
+                 hedge_min_samples: int = 20,
+                 max_workers: int = 64,
+                 max_retries: int = 2,
+                 retry_backoff: float = 0.5):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.trackers: Dict[str, LatencyTracker] = {}
+        self.hedge_stats: Dict[str, Dict[str, int]] = {}
+        self.lock = threading.Lock()
+        # Hedged attempts only. Slots are taken without blocking, so an attempt never
+        # queues behind others; without a free slot the call runs unhedged on the caller's thread.
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self.hedge_slots = threading.BoundedSemaphore(max_workers)
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        with self.lock:
+            if name not in self.breakers:
+                self.breakers[name] = CircuitBreaker(name, self.failure_threshold, self.reset_timeout)
+            return self.breakers[name]
+
+    def tracker(self, operation: str) -> LatencyTracker:
+        with self.lock:
+            if operation not in self.trackers:
+                self.trackers[operation] = LatencyTracker()
+                self.hedge_stats[operation] = {"calls": 0, "hedged": 0, "hedge_wins": 0}
+            return self.trackers[operation]
+
+    def hedge_delay(self, operation: str) -> Optional[float]:
+        """p95 latency of the operation, or None until enough samples exist."""
+        tracker = self.tracker(operation)
+        if len(tracker) < self.hedge_min_samples:
+            return None
+        return tracker.percentile(self.hedge_percentile)
+
+    def _count(self, operation: str, key: str) -> None:
+        with self.lock:
+            self.hedge_stats[operation][key] += 1
+
+    def _submit_hedge_attempt(self, fn: Callable[[], Any]):
+        """Run `fn` on the hedge pool if a slot is free right now, else return None."""
+        if not self.hedge_slots.acquire(blocking=False):
+            return None
+        future = self.executor.submit(fn)
+        future.add_done_callback(lambda _: self.hedge_slots.release())
+        return future
+
+    def _run_hedged(self, operation: str, fn: Callable[[], Any], timeout: float) -> Any:
+        delay = self.hedge_delay(operation)
+        if delay is None or delay >= timeout:
+            return fn()
+        primary = self._submit_hedge_attempt(fn)
+        if primary is None:
+            return fn()
+
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge = self._submit_hedge_attempt(fn)
+        if hedge is None:
+            return primary.result(timeout=max(0.0, timeout - delay))
+        self._count(operation, "hedged")
+        pending = {primary, hedge}
+        error = None
+        deadline = time.monotonic() + timeout - delay
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count(operation, "hedge_wins")
+                    return future.result()
+                error = future.exception()
+        if error is not None:
+            raise error
+        raise TimeoutError(f"{operation} did not complete within {timeout:.2f}s")
+
+    async def _arun_hedged(self, operation: str, fn: Callable[[], Awaitable[Any]], timeout: float) -> Any:
+        delay = self.hedge_delay(operation)
+        primary = asyncio.ensure_future(fn())
+        if delay is None or delay >= timeout:
+            return await asyncio.wait_for(primary, timeout=timeout)
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count(operation, "hedged")
+        hedge = asyncio.ensure_future(fn())
+        pending = {primary, hedge}
+        error = None
+        deadline = time.monotonic() + timeout - delay
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending,
+                                                   timeout=max(0.0, deadline - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count(operation, "hedge_wins")
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        if error is not None:
+            raise error
+        raise TimeoutError(f"{operation} did not complete within {timeout:.2f}s")
+
+    def _candidates(self, deployments: List[Optional[str]]) -> List[str]:
+        names = [name for name in deployments if name]
+        return list(dict.fromkeys(names))
+
+    def _attempts(self, deployments: List[Optional[str]]):
+        """Deployments in failover order, repeated for each retry pass, with the pass number."""
+        candidates = self._candidates(deployments)
+        for retry in range(self.max_retries + 1):
+            for deployment in candidates:
+                yield retry, deployment
+
+    def _backoff(self, retry: int, requested: Optional[float] = None) -> Optional[float]:
+        """
+        Delay before retry pass `retry`: exponential backoff, or the server-requested delay
+        if longer. None when a requested delay doesn't fit in the remaining budget.
+        """
+        delay = self.retry_backoff * (2 ** (retry - 1))
+        if requested is not None:
+            delay = max(delay, min(requested, MAX_RETRY_AFTER))
+        remaining = remaining_budget()
+        if remaining is None:
+            return delay
+        if requested is not None and requested >= remaining:
+            return None
+        return min(delay, max(0.0, remaining))
+
+    def _record_error(self, operation: str, deployment: str, breaker: CircuitBreaker, error: Exception) -> None:
+        if is_throttled(error):
+            breaker.record_throttled()
+            logger.warning(f"{operation} throttled on '{deployment}': {error}")
+        else:
+            breaker.record_failure()
+            logger.warning(f"{operation} failed on '{deployment}': {error}")
+
+    def call(self,
+             operation: str,
+             deployments: List[Optional[str]],
+             fn: Callable[[str, float], Any],
+             default_timeout: float,
+             hedge: bool = False) -> Any:
+        """
+        Call `fn(deployment, timeout)` on the first deployment whose breaker allows it,
+        failing over to the next one (and retrying) on transient errors.
+        """
+        tracker = self.tracker(operation)
+        self._count(operation, "calls")
+        last_error = None
+        requested_delay = None
+        current_pass = 0
+        for retry, deployment in self._attempts(deployments):
+            if retry != current_pass:
+                current_pass = retry
+                if last_error is None:
+                    break
+                delay = self._backoff(retry, requested_delay)
+                if delay is None:
+                    break
+                time.sleep(delay)
+                requested_delay = None
+            # computed before taking a breaker trial, so an exhausted budget can't strand it
+            timeout = call_timeout(default_timeout)
+            breaker = self.breaker(deployment)
+            if not breaker.allow():
+                continue
+            recorded = False
+            start = time.monotonic()
+            try:
+                if hedge:
+                    result = self._run_hedged(operation, lambda: fn(deployment, timeout), timeout)
+                else:
+                    result = fn(deployment, timeout)
+                tracker.record(time.monotonic() - start)
+                breaker.record_success()
+                recorded = True
+                return result
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                self._record_error(operation, deployment, breaker, e)
+                recorded = True
+                if is_throttled(e):
+                    requested_delay = max(requested_delay or 0.0, retry_after(e) or 0.0)
+                last_error = e
+            finally:
+                if not recorded:
+                    breaker.release_trial()
+        if last_error is not None:
+            raise last_error
+        raise CircuitOpenError(f"All circuits open for {operation}: {self._candidates(deployments)}")
+
+    async def acall(self,
+                    operation: str,
+                    deployments: List[Optional[str]],
+                    fn: Callable[[str, float], Awaitable[Any]],
+                    default_timeout: float,
+                    hedge: bool = False) -> Any:
+        """
+        Async variant of `call`; `fn(deployment, timeout)` must return an awaitable.
+        """
+        tracker = self.tracker(operation)
+        self._count(operation, "calls")
+        last_error = None
+        requested_delay = None
+        current_pass = 0
+        for retry, deployment in self._attempts(deployments):
+            if retry != current_pass:
+                current_pass = retry
+                if last_error is None:
+                    break
+                delay = self._backoff(retry, requested_delay)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+                requested_delay = None
+            timeout = call_timeout(default_timeout)
+            breaker = self.breaker(deployment)
+            if not breaker.allow():
+                continue
+            recorded = False
+            start = time.monotonic()
+            try:
+                if hedge:
+                    result = await self._arun_hedged(operation, lambda: fn(deployment, timeout), timeout)
+                else:
+                    result = await asyncio.wait_for(fn(deployment, timeout), timeout=timeout)
+                tracker.record(time.monotonic() - start)
+                breaker.record_success()
+                recorded = True
+                return result
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                self._record_error(operation, deployment, breaker, e)
+                recorded = True
+                if is_throttled(e):
+                    requested_delay = max(requested_delay or 0.0, retry_after(e) or 0.0)
+                last_error = e
+            finally:
+                # also covers cancellation, which is not an Exception
+                if not recorded:
+                    breaker.release_trial()
+        if last_error is not None:
+            raise last_error
+        raise CircuitOpenError(f"All circuits open for {operation}: {self._candidates(deployments)}")
+
+    def stats(self) -> Dict:
+        with self.lock:
+            operations = list(self.trackers)
+            hedges = {op: dict(self.hedge_stats[op]) for op in operations}
+            breakers = list(self.breakers.values())
+        for op in operations:
+            hedges[op]["samples"] = len(self.trackers[op])
+            hedges[op]["p95_seconds"] = self.trackers[op].percentile(95)
+        return {
+            "hedging": hedges,
+            "breakers": {breaker.name: breaker.snapshot() for breaker in breakers},
+        }
@@ -0,0 +1,145 @@
+import asyncio
+import math
+import time
+from typing import Dict, Optional
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being admitted."""
+
+    def __init__(self, lane: str, status_code: int, reason: str, retry_after: int):
+        super().__init__(f"{lane} lane rejected request: {reason}")
+        self.lane = lane
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lane:
+    """
+    Concurrency limit plus bounded wait queue for one class of traffic.
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_concurrency: int,
+                 max_queue: int,
+                 max_wait: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+
+    def has_capacity(self) -> bool:
+        return self.active < self.max_concurrency
+
+    def retry_after(self) -> int:
+        """Hint for clients on when to retry: the lane's max wait, at least one second."""
+        return max(1, math.ceil(self.max_wait))
+
+    def snapshot(self) -> Dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_wait_seconds": self.max_wait,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_wait_seconds": self.total_wait / self.admitted if self.admitted else 0.0,
+            "max_wait_observed_seconds": self.max_observed_wait,
+        }
+
+
+class AdmissionController:
+    """
+    Admission control between interactive query traffic and bulk ingestion.
+
+    - Each lane has its own concurrency limit and bounded queue.
+    - Query requests have priority: ingestion is only admitted while no query is waiting.
+    - A full queue is rejected immediately with 429; a request that waits longer than
+      the lane's max wait is rejected with 503. Both carry a Retry-After hint.
+    """
+
+    QUERY = "query"
+    INGESTION = "ingestion"
+
+    def __init__(self,
+                 query_concurrency: int = 16,
+                 query_queue: int = 64,
+                 query_max_wait: float = 5.0,
+                 ingestion_concurrency: int = 2,
+                 ingestion_queue: int = 8,
+                 ingestion_max_wait: float = 30.0):
+        self.lanes = {
+            self.QUERY: Lane(self.QUERY, query_concurrency, query_queue, query_max_wait),
+            self.INGESTION: Lane(self.INGESTION, ingestion_concurrency, ingestion_queue, ingestion_max_wait),
+        }
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        # Created lazily so it binds to the server's running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _can_admit(self, lane: Lane) -> bool:
+        if not lane.has_capacity():
+            return False
+        if lane.name == self.INGESTION and self.lanes[self.QUERY].waiting > 0:
+            return False
+        return True
+
+    async def acquire(self, lane_name: str) -> None:
+        lane = self.lanes[lane_name]
+        async with self.condition:
+            if self._can_admit(lane) and lane.waiting == 0:
+                lane.active += 1
+                lane.admitted += 1
+                return
+
+            if lane.waiting >= lane.max_queue:
+                lane.rejected_queue_full += 1
+                logger.warning(f"Shedding {lane.name} request: queue full ({lane.waiting} waiting)")
+                raise AdmissionRejected(lane.name, 429, "queue full", lane.retry_after())
+
+            lane.waiting += 1
+            start = time.monotonic()
+            try:
+                await asyncio.wait_for(self.condition.wait_for(lambda: self._can_admit(lane)),
+                                       timeout=lane.max_wait)
+            except asyncio.TimeoutError:
+                lane.rejected_timeout += 1
+                logger.warning(f"Shedding {lane.name} request: waited more than {lane.max_wait}s")
+                raise AdmissionRejected(lane.name, 503, "queue wait exceeded", lane.retry_after())
+            finally:
+                lane.waiting -= 1
+                # a query leaving the queue may unblock ingestion
+                self.condition.notify_all()
+
+            waited = time.monotonic() - start
+            lane.active += 1
+            lane.admitted += 1
+            lane.total_wait += waited
+            lane.max_observed_wait = max(lane.max_observed_wait, waited)
+
+    async def release(self, lane_name: str) -> None:
+        lane = self.lanes[lane_name]
+        async with self.condition:
+            lane.active -= 1
+            self.condition.notify_all()
+
+    def metrics(self) -> Dict:
+        return {name: lane.snapshot() for name, lane in self.lanes.items()}
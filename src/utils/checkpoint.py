@@ -0,0 +1,192 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Dict, List, Optional, Set
+import numpy as np
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class DocumentTooLargeError(ValueError):
+    """Raised when an incoming document exceeds the configured size limit."""
+
+
+def stream_sha256(stream, max_bytes: int = None, block_size: int = 1024 * 1024) -> str:
+    """
+    Hash a binary stream in blocks, enforcing `max_bytes` as it goes so oversized
+    documents are rejected before any parsing. The stream is rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for block in iter(lambda: stream.read(block_size), b""):
+        size += len(block)
+        if max_bytes is not None and size > max_bytes:
+            raise DocumentTooLargeError(f"Document exceeds the {max_bytes} bytes limit.")
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Hash a file in blocks without loading it into memory."""
+    with open(file_path, "rb") as f:
+        return stream_sha256(f, block_size=block_size)
+
+
+class IngestionCheckpoint:
+    """
+    Durable per-document checkpoints for the ingestion pipeline.
+
+    One directory per (document content, ingestion parameters) holding the output
+    of each completed unit of work:
+    - extracted.json: items returned by `process_document`
+    - ocr/<page>.txt: vision OCR text per page
+    - chunks.json: chunk texts with their document ids and creation date
+    - embeddings/<chunk>.npy: float32 embedding per chunk
+    - uploaded.json: indices of batches confirmed by the search service
+
+    Every write is atomic (temp file + rename), so a crash never leaves a
+    half-written unit behind. Once ingestion succeeds the directory is removed
+    and replaced by a `<key>.done` marker holding the completion time.
+    Ingestions of the same document are serialized with `lock()`.
+    """
+
+    def __init__(self, base_dir: str, key: str):
+        self.key = key
+        self.path = os.path.join(base_dir, key)
+        self.lock_path = f"{self.path}.lock"
+        self.done_path = f"{self.path}.done"
+        os.makedirs(base_dir, exist_ok=True)
+
+    @contextmanager
+    def lock(self):
+        """
+        Hold an exclusive lock on this checkpoint (across threads and worker processes),
+        so concurrent uploads of the same document don't write into or clear each
+        other's checkpoint. A waiting upload resumes from whatever the first one left;
+        use `completed_since` to detect that the first one already finished.
+        """
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # touch the lock so it is not purged as stale while held
+            os.utime(self.lock_path)
+            try:
+                os.makedirs(os.path.join(self.path, "ocr"), exist_ok=True)
+                os.makedirs(os.path.join(self.path, "embeddings"), exist_ok=True)
+                yield self
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def make_key(content_hash: str, **params) -> str:
+        """Key that changes whenever the document or anything affecting its output does."""
+        digest = hashlib.sha256(content_hash.encode("utf-8"))
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def purge_stale(base_dir: str, max_age_seconds: float) -> None:
+        """Remove checkpoints of ingestions abandoned for longer than `max_age_seconds`."""
+        if not os.path.isdir(base_dir):
+            return
+        cutoff = time.time() - max_age_seconds
+        for name in os.listdir(base_dir):
+            path = os.path.join(base_dir, name)
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                logger.info(f"Removing stale ingestion checkpoint '{name}'")
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.endswith((".lock", ".done")) and not os.path.isdir(os.path.splitext(path)[0]) \
+                    and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+    def _file(self, *parts: str) -> str:
+        return os.path.join(self.path, *parts)
+
+    def _write(self, path: str, data: bytes) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        # touch the directory so active ingestions are not purged as stale
+        os.utime(self.path)
+
+    def _read_json(self, *parts: str):
+        path = self._file(*parts)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_json(self, payload, *parts: str) -> None:
+        self._write(self._file(*parts), json.dumps(payload).encode("utf-8"))
+
+    # --- extraction ---
+    def load_extracted(self) -> Optional[List[Dict]]:
+        return self._read_json("extracted.json")
+
+    def save_extracted(self, items: List[Dict]) -> None:
+        self._write_json(items, "extracted.json")
+
+    # --- OCR ---
+    def load_ocr(self) -> Dict[int, str]:
+        pages = {}
+        for name in os.listdir(self._file("ocr")):
+            if name.endswith(".txt"):
+                with open(self._file("ocr", name), "r", encoding="utf-8") as f:
+                    pages[int(name[:-4])] = f.read()
+        return pages
+
+    def save_ocr_page(self, index: int, text: str) -> None:
+        self._write(self._file("ocr", f"{index}.txt"), text.encode("utf-8"))
+
+    # --- chunks ---
+    def load_chunks(self) -> Optional[Dict]:
+        return self._read_json("chunks.json")
+
+    def save_chunks(self, chunks: Dict) -> None:
+        self._write_json(chunks, "chunks.json")
+
+    # --- embeddings ---
+    def load_embedding(self, index: int) -> Optional[np.ndarray]:
+        path = self._file("embeddings", f"{index}.npy")
+        if not os.path.exists(path):
+            return None
+        return np.load(path)
+
+    def save_embedding(self, index: int, vector: np.ndarray) -> None:
+        buffer = BytesIO()
+        np.save(buffer, vector)
+        self._write(self._file("embeddings", f"{index}.npy"), buffer.getvalue())
+
+    # --- uploads ---
+    def load_uploaded_batches(self) -> Set[int]:
+        return set(self._read_json("uploaded.json") or [])
+
+    def mark_batch_uploaded(self, batch_index: int) -> None:
+        uploaded = self.load_uploaded_batches()
+        uploaded.add(batch_index)
+        self._write_json(sorted(uploaded), "uploaded.json")
+
+    # --- completion ---
+    def completed_since(self, timestamp: float) -> bool:
+        """Whether an ingestion of this document finished after `timestamp`."""
+        if not os.path.exists(self.done_path):
+            return False
+        with open(self.done_path, "r", encoding="utf-8") as f:
+            return float(f.read() or 0) >= timestamp
+
+    def mark_completed(self) -> None:
+        """Record the completion time and remove the stage outputs."""
+        self._write(self.done_path, str(time.time()).encode("utf-8"))
+        self.clear()
+
+    def clear(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -1,6 +1,9 @@
+import io
 import os
 import base64
+import shutil
 import subprocess
+from contextlib import contextmanager
 from pathlib import Path
 from io import BytesIO
 from PIL import Image
@@ -31,13 +34,56 @@ def libreoffice_to_pdf(input_path: str, output_dir: str) -> str:
     return os.path.join(output_dir, pdf_file)
 
 
-def process_document(file_path,
+@contextmanager
+def _on_disk(file_path=None, stream=None, file_name=None):
+    """
+    Yield a filesystem path for tools that can only read from disk (LibreOffice, antiword).
+    Streams are written to a unique temporary directory, so concurrent uploads with the
+    same file name never overwrite each other.
+    """
+    if file_path is not None:
+        yield file_path
+        return
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, os.path.basename(file_name))
+        stream.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(stream, f)
+        yield path
+
+
+def _open_pdf(file_path=None, stream=None):
+    """Open a PDF from a path or from the bytes of a stream (read fully into memory)."""
+    if file_path is not None:
+        return fitz.open(file_path)
+    stream.seek(0)
+    return fitz.open(stream=stream.read(), filetype="pdf")
+
+
+def _rasterize_pdf(doc, dpi, image_format):
+    results = []
+    for page in doc:
+        pix = page.get_pixmap(dpi=dpi)
+        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+        b64 = encode_image_to_base64(img, format=image_format.upper())
+        results.append({"type": "image", "content": b64})
+    return results
+
+
+def process_document(file_path=None,
                      dpi=200,
                      image_format="PNG",
-                     processing_mode="quality"):
+                     processing_mode="quality",
+                     stream=None,
+                     file_name=None):
     """
     Process PDF, DOCX, DOC, TXT, PPT, PPTX and image files.
 
+    The document is read either from `file_path` or from a binary file-like `stream`
+    (e.g. the spooled upload buffer) together with its `file_name`. Streams are parsed
+    without a temporary copy (PDFs are read into memory first); only LibreOffice and
+    antiword get a copy on disk.
+
     processing_mode:
         - "normal": extracts text whenever possible
         - "quality": converts everything to images via LibreOffice + PyMuPDF
@@ -46,39 +92,33 @@ def process_document(file_path,
       {"type": "image", "content": <base64>}
       {"type": "text", "content": <string>}
     """
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"File not found: {file_path}")
+    if stream is None:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        file_name = file_path
+    else:
+        if not file_name:
+            raise ValueError("file_name is required when reading from a stream.")
+        stream.seek(0)
 
-    ext = Path(file_path).suffix.lower()
+    ext = Path(file_name).suffix.lower()
+    source = file_path if stream is None else stream
     results = []
 
     # ---------------- QUALITY MODE ----------------
     if processing_mode == "quality":
         if ext == ".pdf":
-            pdf_path = file_path
-        else:
+            # Caso seja PDF, processa direto (sem criar tmpdir)
+            return _rasterize_pdf(_open_pdf(file_path, stream), dpi, image_format)
+
+        with _on_disk(file_path, stream, file_name) as input_path:
             with tempfile.TemporaryDirectory() as tmpdir:
-                pdf_path = libreoffice_to_pdf(file_path, tmpdir)
-                doc = fitz.open(pdf_path)
-                for page in doc:
-                    pix = page.get_pixmap(dpi=dpi)
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    b64 = encode_image_to_base64(img, format=image_format.upper())
-                    results.append({"type": "image", "content": b64})
-            return results
-
-        # Caso seja PDF, processa direto (sem criar tmpdir)
-        doc = fitz.open(pdf_path)
-        for page in doc:
-            pix = page.get_pixmap(dpi=dpi)
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            b64 = encode_image_to_base64(img, format=image_format.upper())
-            results.append({"type": "image", "content": b64})
-        return results
+                pdf_path = libreoffice_to_pdf(input_path, tmpdir)
+                return _rasterize_pdf(fitz.open(pdf_path), dpi, image_format)
 
     # ---------------- NORMAL MODE ----------------
     if ext == ".pdf":
-        doc = fitz.open(file_path)
+        doc = _open_pdf(file_path, stream)
         for page in doc:
             text = page.get_text().strip()
             if text:
@@ -87,19 +127,20 @@ def process_document(file_path,
                         results.append({"type": "text", "content": line.strip()})
 
     elif ext == ".docx":
-        doc = Document(file_path)
+        doc = Document(source)
         for para in doc.paragraphs:
             if para.text.strip():
                 results.append({"type": "text", "content": para.text.strip()})
 
     elif ext == ".doc":
         try:
-            result = subprocess.run(
-                ["antiword", file_path],
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            with _on_disk(file_path, stream, file_name) as doc_path:
+                result = subprocess.run(
+                    ["antiword", doc_path],
+                    capture_output=True,
+                    text=True,
+                    check=True
+                )
             text = result.stdout.strip()
             if text:
                 for line in text.splitlines():
@@ -111,13 +152,23 @@ def process_document(file_path,
             raise RuntimeError(f"Antiword failed to extract text: {e}")
 
     elif ext == ".txt":
-        with open(file_path, "r", encoding="utf-8") as f:
+        if stream is None:
+            f = open(file_path, "r", encoding="utf-8")
+        else:
+            f = io.TextIOWrapper(stream, encoding="utf-8")
+        try:
             for line in f:
                 if line.strip():
                     results.append({"type": "text", "content": line.strip()})
+        finally:
+            if stream is None:
+                f.close()
+            else:
+                # leave the caller's stream open
+                f.detach()
 
     elif ext in [".ppt", ".pptx"]:
-        prs = Presentation(file_path)
+        prs = Presentation(source)
         for slide in prs.slides:
             slide_text = []
             for shape in slide.shapes:
@@ -127,11 +178,11 @@ def process_document(file_path,
                 results.append({"type": "text", "content": "\n".join(slide_text)})
 
     elif ext in [".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".tiff", ".svg"]:
-        img = Image.open(file_path)
+        img = Image.open(source)
         b64 = encode_image_to_base64(img, format=image_format.upper())
         results.append({"type": "image", "content": b64})
 
     else:
         raise ValueError(f"Unsupported file format: {ext}")
 
-    return results
\ No newline at end of file
+    return results
@@ -1,11 +1,47 @@
+import base64
 import json
-from typing import List, Dict
+import math
+import re
+from io import BytesIO
+from typing import Callable, List, Dict
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from PIL import Image
 from src.services import OpenAIService
 from src.utils import setup_logger
 
 logger = setup_logger(__name__)
 
+# Content density thresholds (fraction of "ink" pixels on a grayscale thumbnail). Only pages
+# with essentially no ink count as blank. Light pages are truly sparse ones (cover, signature
+# or annex title pages, up to ~3 lines of 10 pt text on a letter page); a page of 10 pt text
+# gains ~0.003 per line.
+BLANK_DENSITY = 0.0001
+LIGHT_DENSITY = 0.01
+
+# Resolution and encoding per density class, as a target short side in pixels. High-detail
+# images are scaled by the service to a 768 px short side anyway, so every page with text is
+# sent at exactly that resolution (no OCR accuracy lost against the 200-DPI path, and less
+# upload); only blank pages go low detail. Light pages differ from dense ones in being packed.
+PAGE_PROFILES = {
+    "blank": {"short_side": 512, "format": "JPEG", "detail": "low"},
+    "light": {"short_side": 768, "format": "PNG", "detail": "high"},
+    "dense": {"short_side": 768, "format": "PNG", "detail": "high"},
+}
+
+class PageProcessingError(RuntimeError):
+    """
+    Raised when some pages could not be read. `errors` maps page index to its exception;
+    `completed` holds the pages of the same call that were read successfully.
+    """
+
+    def __init__(self, errors: Dict[int, Exception], completed: Dict[int, str] = None):
+        self.errors = errors
+        self.completed = completed or {}
+        details = "; ".join(f"image {idx}: {error}" for idx, error in sorted(errors.items()))
+        super().__init__(f"Failed to process {len(errors)} images: {details}")
+
+PAGE_MARKER = re.compile(r"^### PAGE (\d+)\s*$", re.MULTILINE)
+
 def build_prompt(document_informations:str = None) -> str:
     """
     Build the system prompt specifically for reading and extracting
@@ -26,6 +62,104 @@ def build_prompt(document_informations:str = None) -> str:
         prompt += f"Use this to guide your final output."
     return prompt
 
+def build_batch_prompt(page_numbers: List[int], document_informations: str = None) -> str:
+    """
+    Extend the OCR prompt for a request carrying several pages, asking the model to
+    delimit each page so the response can be split back per page.
+    """
+    prompt = build_prompt(document_informations=document_informations)
+    prompt += f"""
+    Several pages are provided, each image preceded by its page label.
+    Read every page independently. For each page, start its output with a line
+    containing exactly `### PAGE <n>` (pages: {", ".join(str(n) for n in page_numbers)}),
+    followed by the extracted content of that page only.
+    """
+    return prompt
+
+def estimate_image_tokens(width: int, height: int, detail: str = "high") -> int:
+    """
+    Approximate image input tokens for vision models: 85 for low detail; otherwise the
+    image is fit into 2048x2048, its short side scaled to 768 and 170 tokens charged per
+    512 px tile plus 85.
+    """
+    if detail == "low":
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+def content_density(img: Image.Image) -> float:
+    """Fraction of dark pixels on a small grayscale thumbnail of the page."""
+    thumb = img.convert("L")
+    thumb.thumbnail((256, 256))
+    histogram = thumb.histogram()
+    return sum(histogram[:200]) / max(1, sum(histogram))
+
+def prepare_page(img_b64: str, index: int) -> Dict:
+    """
+    Size and encode a page image for the vision model according to its content density.
+    Returns the data URL plus the metadata the scheduler needs.
+    """
+    img = Image.open(BytesIO(base64.b64decode(img_b64)))
+    density = content_density(img)
+    if density < BLANK_DENSITY:
+        profile_name = "blank"
+    elif density < LIGHT_DENSITY:
+        profile_name = "light"
+    else:
+        profile_name = "dense"
+    profile = PAGE_PROFILES[profile_name]
+
+    scale = min(1.0, profile["short_side"] / min(img.width, img.height))
+    if scale < 1.0:
+        img = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+    if profile["format"] == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")
+
+    buffer = BytesIO()
+    img.save(buffer, format=profile["format"], quality=80)
+    encoded = base64.b64encode(buffer.getvalue()).decode("utf-8")
+    return {
+        "index": index,
+        "profile": profile_name,
+        "density": density,
+        "url": f"data:image/{profile['format'].lower()};base64,{encoded}",
+        "detail": profile["detail"],
+        "tokens": estimate_image_tokens(img.width, img.height, profile["detail"]),
+    }
+
+def plan_batches(pages: List[Dict], max_pages_per_request: int = 4) -> List[List[Dict]]:
+    """
+    Group pages into vision requests: dense pages go alone, blank and light pages are
+    packed together (in page order) up to `max_pages_per_request` per request.
+    """
+    batches = []
+    pending = []
+    for page in pages:
+        if page["profile"] == "dense":
+            batches.append([page])
+            continue
+        pending.append(page)
+        if len(pending) == max_pages_per_request:
+            batches.append(pending)
+            pending = []
+    if pending:
+        batches.append(pending)
+    return batches
+
+def split_batch_response(response: str, page_numbers: List[int]) -> Dict[int, str]:
+    """Split a multi-page response on its `### PAGE <n>` markers, keeping only expected pages."""
+    markers = list(PAGE_MARKER.finditer(response or ""))
+    pages = {}
+    for i, marker in enumerate(markers):
+        number = int(marker.group(1))
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(response)
+        if number in page_numbers:
+            pages[number] = response[marker.end():end].strip()
+    return pages
+
 def _process_single_image(img_b64: str, 
                           service: OpenAIService, 
                           index: int, 
@@ -55,22 +189,86 @@ def _process_single_image(img_b64: str,
         return response
     except Exception as e:
         logger.error(f"Error processing image {index}: {e}")
-        return f"Error processing image {index}: {e}"
+        raise
+
+def _process_batch(batch: List[Dict],
+                   service: OpenAIService,
+                   max_tokens: int,
+                   document_informations: str = None) -> Dict[int, str]:
+    """
+    Read a batch of prepared pages. A single page is sent as is; several pages go in one
+    multimodal request with per-page labels, and the response is split back per page.
+    Pages missing from a multi-page response are re-read one by one; if any of those
+    fail, PageProcessingError is raised carrying the pages that were read.
+    """
+    page_numbers = [page["index"] for page in batch]
+    logger.info(f"Starting processing of images {page_numbers}")
+
+    content_parts = []
+    for page in batch:
+        if len(batch) > 1:
+            content_parts.append({"type": "text", "text": f"### PAGE {page['index']}"})
+        content_parts.append({
+            "type": "image_url",
+            "image_url": {"url": page["url"], "detail": page["detail"]}
+        })
+
+    if len(batch) == 1:
+        system_prompt = build_prompt(document_informations=document_informations)
+    else:
+        system_prompt = build_batch_prompt(page_numbers, document_informations=document_informations)
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": content_parts},
+    ]
+    response = service.invoke(messages,
+                              max_tokens=max_tokens * len(batch))
+
+    if len(batch) == 1:
+        results = {page_numbers[0]: response}
+    else:
+        results = split_batch_response(response, page_numbers)
+        missing = [page for page in batch if page["index"] not in results]
+        if missing:
+            logger.warning(f"Pages {[page['index'] for page in missing]} missing from batch response, retrying individually")
+            errors = {}
+            for page in missing:
+                try:
+                    results.update(_process_batch([page], service, max_tokens, document_informations))
+                except Exception as e:
+                    logger.error(f"Error processing image {page['index']}: {e}")
+                    errors[page["index"]] = e
+            if errors:
+                raise PageProcessingError(errors, completed=results)
+
+    logger.info(f"Finished processing of images {page_numbers}")
+    return results
 
 def process_document_images(
     document_content: List[Dict],
     service: OpenAIService,
     max_workers: int = 10,
     max_tokens: int = 1000,
-    document_informations: str = None
+    document_informations: str = None,
+    completed_pages: Dict[int, str] = None,
+    on_page_done: Callable[[int, str], None] = None,
+    adaptive: bool = True,
+    max_pages_per_request: int = 4
 ) -> str:
     """
     Process document images using Azure OpenAI in parallel, but return a single continuous text.
 
     - Extracts all images from the input `document_content`.
-    - Each image is processed independently with its own model call.
+    - With `adaptive`, each page is resized and re-encoded by content density, and blank or
+      light pages are packed up to `max_pages_per_request` per model call; otherwise each
+      image is processed independently with its own model call.
     - Uses ThreadPoolExecutor to parallelize multiple calls to the model.
     - Concatenates all results in order into a single continuous text.
+    - Pages found in `completed_pages` (1-based index -> text) are not sent again;
+      `on_page_done` is called for every page read successfully, e.g. to checkpoint it.
+    - If any page fails, PageProcessingError is raised once all requests have finished,
+      so failures never end up in the text and a retry only re-reads the failed pages.
     """
 
     # Filter only images
@@ -82,31 +280,66 @@ def process_document_images(
 
     logger.info(f"Starting processing of {len(images)} images with {max_workers} workers.")
 
-    results_dict = {}
+    results_dict = dict(completed_pages or {})
+    errors = {}
+    if results_dict:
+        logger.info(f"Resuming: {len(results_dict)} images already processed.")
+
+    todo = [(idx, img) for idx, img in enumerate(images, start=1) if idx not in results_dict]
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_index = {
-            executor.submit(
-                _process_single_image,
-                img,
-                service,
-                idx,
-                max_tokens,
-                document_informations=document_informations
-            ): idx
-            for idx, img in enumerate(images, start=1)
-        }
-
-        for future in as_completed(future_to_index):
-            idx = future_to_index[future]
+        if adaptive:
+            pages = list(executor.map(lambda item: prepare_page(item[1], item[0]), todo))
+            batches = plan_batches(pages, max_pages_per_request=max_pages_per_request)
+            # submit the slow dense pages first so they don't trail behind the packed light ones
+            batches.sort(key=lambda batch: batch[0]["profile"] != "dense")
+            logger.info(f"Scheduled {len(pages)} images into {len(batches)} requests.")
+            future_to_pages = {
+                executor.submit(
+                    _process_batch,
+                    batch,
+                    service,
+                    max_tokens,
+                    document_informations=document_informations
+                ): [page["index"] for page in batch]
+                for batch in batches
+            }
+        else:
+            future_to_pages = {
+                executor.submit(
+                    _process_single_image,
+                    img,
+                    service,
+                    idx,
+                    max_tokens,
+                    document_informations=document_informations
+                ): [idx]
+                for idx, img in todo
+            }
+
+        for future in as_completed(future_to_pages):
+            indexes = future_to_pages[future]
             try:
-                results_dict[idx] = future.result()
+                result = future.result()
+                page_results = result if adaptive else {indexes[0]: result}
+            except PageProcessingError as e:
+                errors.update(e.errors)
+                page_results = e.completed
             except Exception as e:
-                logger.error(f"Exception occurred for image {idx}: {e}")
-                results_dict[idx] = f"Exception for image {idx}: {e}"
+                for idx in indexes:
+                    errors[idx] = e
+                continue
+            for idx, text in page_results.items():
+                results_dict[idx] = text
+                if on_page_done:
+                    on_page_done(idx, text)
+
+    if errors:
+        logger.error(f"{len(errors)} of {len(images)} images failed.")
+        raise PageProcessingError(errors)
 
     # Concatenate results in the original order
     continuous_text = "\n".join(results_dict[idx] for idx in sorted(results_dict.keys()))
 
     logger.info("Finished processing all images.")
-    return continuous_text
\ No newline at end of file
+    return continuous_text
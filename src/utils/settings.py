@@ -9,7 +9,33 @@ class Settings(BaseSettings):
     azure_openai_endpoint: Optional[str] = None
     llm_deployment_model: Optional[str] = None
     embedding_deployment_model: Optional[str] = None
+    llm_fallback_deployment_model: Optional[str] = None
+    embedding_fallback_deployment_model: Optional[str] = None
     llm_api_version: Optional[str] = None
     embedding_api_version: Optional[str] = None
     azure_ai_search_endpoint: Optional[str] = None
-    azure_ai_search_key: Optional[str] = None
\ No newline at end of file
+    azure_ai_search_key: Optional[str] = None
+
+    # admission control (query vs ingestion traffic)
+    query_max_concurrency: int = 16
+    query_max_queue: int = 64
+    query_max_wait_seconds: float = 5.0
+    ingestion_max_concurrency: int = 2
+    ingestion_max_queue: int = 8
+    ingestion_max_wait_seconds: float = 30.0
+
+    # resilience for external calls (deadlines, hedging, circuit breaking)
+    ask_request_budget_seconds: float = 30.0
+    search_timeout_seconds: float = 10.0
+    breaker_failure_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
+
+    # resumable ingestion checkpoints
+    ingestion_checkpoint_dir: str = "/tmp/ingestion_checkpoints"
+    ingestion_checkpoint_ttl_hours: float = 72.0
+
+    # document intake
+    max_upload_bytes: int = 100 * 1024 * 1024
+
+    # opt-in traffic capture (JSONL) for replay and load testing
+    traffic_capture_path: Optional[str] = None
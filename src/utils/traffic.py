@@ -0,0 +1,31 @@
+import json
+import threading
+from typing import Dict
+from src.utils.logging import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class TrafficRecorder:
+    """
+    Append-only JSONL log of API requests, used to replay production traffic.
+
+    Each line holds the arrival time (epoch seconds), endpoint, status, latency and the
+    request parameters needed to rebuild the call (question, index, top_k, upload size).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+        logger.info(f"Capturing traffic to '{path}'")
+
+    def record(self, event: Dict) -> None:
+        line = json.dumps(event, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
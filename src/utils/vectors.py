@@ -0,0 +1,30 @@
+import base64
+from typing import Dict, List
+import numpy as np
+import orjson
+
+EMBEDDING_DTYPE = np.float32
+
+
+def decode_embedding(embedding) -> np.ndarray:
+    """
+    Turn an embedding returned by the API into a contiguous float32 array.
+
+    Accepts the base64 payload returned with `encoding_format="base64"` (little-endian
+    float32 bytes, decoded without creating any Python floats) or a plain list of floats.
+    """
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype="<f4").astype(EMBEDDING_DTYPE, copy=False)
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPE)
+
+
+def dumps(payload) -> bytes:
+    """Serialize to JSON bytes, writing NumPy arrays straight from their buffers."""
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def encode_index_batch(documents: List[Dict], action: str = "upload") -> bytes:
+    """
+    Build the JSON body of an Azure AI Search `docs/search.index` request.
+    """
+    return dumps({"value": [{"@search.action": action, **doc} for doc in documents]})
@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from src.utils.admission import AdmissionController, AdmissionRejected
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_admits_up_to_concurrency_and_counts():
+    async def scenario():
+        controller = AdmissionController(query_concurrency=2)
+        await controller.acquire(controller.QUERY)
+        await controller.acquire(controller.QUERY)
+        metrics = controller.metrics()[controller.QUERY]
+        await controller.release(controller.QUERY)
+        return metrics
+
+    metrics = run(scenario())
+    assert metrics["active"] == 2
+    assert metrics["admitted"] == 2
+
+
+def test_full_queue_is_shed_with_429():
+    async def scenario():
+        controller = AdmissionController(query_concurrency=1, query_queue=0, query_max_wait=1)
+        await controller.acquire(controller.QUERY)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire(controller.QUERY)
+        return excinfo.value
+
+    rejection = run(scenario())
+    assert rejection.status_code == 429
+    assert rejection.retry_after >= 1
+
+
+def test_wait_timeout_is_shed_with_503():
+    async def scenario():
+        controller = AdmissionController(query_concurrency=1, query_queue=5, query_max_wait=0.05)
+        await controller.acquire(controller.QUERY)
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire(controller.QUERY)
+        return excinfo.value, controller.metrics()[controller.QUERY]
+
+    rejection, metrics = run(scenario())
+    assert rejection.status_code == 503
+    assert metrics["waiting"] == 0
+    assert metrics["rejected_timeout"] == 1
+
+
+def test_waiting_query_blocks_new_ingestion():
+    async def scenario():
+        controller = AdmissionController(query_concurrency=1, ingestion_concurrency=2, ingestion_max_wait=0.05)
+        await controller.acquire(controller.QUERY)
+        waiting_query = asyncio.ensure_future(controller.acquire(controller.QUERY))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire(controller.INGESTION)
+        await controller.release(controller.QUERY)
+        await waiting_query
+        # with no query waiting, ingestion flows again
+        await controller.acquire(controller.INGESTION)
+
+    run(scenario())
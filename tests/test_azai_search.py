@@ -0,0 +1,61 @@
+import json
+import numpy as np
+import pytest
+from src.services import azai_search
+from src.services.azai_search import AzureSearchService
+from src.utils import Settings
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode("utf-8")
+
+
+class FakePipeline:
+    """Answers index requests, rejecting each key in `throttled` the given number of times."""
+
+    def __init__(self, throttled):
+        self.throttled = dict(throttled)
+        self.requests = []
+
+    def send_request(self, request, **kwargs):
+        docs = json.loads(request.content)["value"]
+        self.requests.append([doc["id"] for doc in docs])
+        results = []
+        for doc in docs:
+            if self.throttled.get(doc["id"], 0) > 0:
+                self.throttled[doc["id"]] -= 1
+                results.append({"key": doc["id"], "status": False, "statusCode": 503, "errorMessage": "throttled"})
+            else:
+                results.append({"key": doc["id"], "status": True, "statusCode": 201})
+        status = 207 if any(not item["status"] for item in results) else 200
+        return FakeResponse(status, {"value": results})
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(azai_search, "INDEX_ITEM_RETRY_BACKOFF", 0)
+    return AzureSearchService(embedding_model=None,
+                              sets=Settings(azure_ai_search_endpoint="https://search.test",
+                                            azure_ai_search_key="key"))
+
+
+def documents(n):
+    return [{"id": str(i), "content_vector": np.zeros(3, dtype=np.float32)} for i in range(n)]
+
+
+def test_throttled_documents_are_resent_alone(service):
+    service.pipeline_client = FakePipeline({"1": 1})
+    confirmed = []
+    service.upload_documents("idx", documents(3), batch_size=10, on_batch_uploaded=confirmed.append)
+    assert service.pipeline_client.requests == [["0", "1", "2"], ["1"]]
+    assert confirmed == [1]
+
+
+def test_batch_with_persistent_failures_is_not_confirmed(service):
+    service.pipeline_client = FakePipeline({"1": 100})
+    confirmed = []
+    with pytest.raises(RuntimeError):
+        service.upload_documents("idx", documents(3), batch_size=10, on_batch_uploaded=confirmed.append)
+    assert confirmed == []
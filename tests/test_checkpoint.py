@@ -0,0 +1,90 @@
+import io
+import os
+import time
+import numpy as np
+from src.utils.checkpoint import IngestionCheckpoint, file_sha256, stream_sha256
+
+
+def make_checkpoint(tmp_path, key="doc"):
+    checkpoint = IngestionCheckpoint(str(tmp_path), key)
+    return checkpoint
+
+
+def test_stage_outputs_round_trip(tmp_path):
+    checkpoint = make_checkpoint(tmp_path)
+    with checkpoint.lock():
+        checkpoint.save_extracted([{"type": "text", "content": "x"}])
+        checkpoint.save_ocr_page(2, "page two")
+        checkpoint.save_chunks({"created_date": "d", "chunks": [{"id": "1", "text": "t"}]})
+        checkpoint.save_embedding(1, np.arange(4, dtype=np.float32))
+        checkpoint.mark_batch_uploaded(2)
+        checkpoint.mark_batch_uploaded(1)
+
+    reopened = make_checkpoint(tmp_path)
+    with reopened.lock():
+        assert reopened.load_extracted() == [{"type": "text", "content": "x"}]
+        assert reopened.load_ocr() == {2: "page two"}
+        assert reopened.load_chunks()["chunks"][0]["id"] == "1"
+        assert reopened.load_embedding(1).dtype == np.float32
+        assert reopened.load_embedding(2) is None
+        assert reopened.load_uploaded_batches() == {1, 2}
+
+
+def test_clear_removes_checkpoint(tmp_path):
+    checkpoint = make_checkpoint(tmp_path)
+    with checkpoint.lock():
+        checkpoint.save_extracted([])
+        checkpoint.clear()
+    assert not os.path.exists(checkpoint.path)
+
+
+def test_purge_stale_keeps_recent_checkpoints(tmp_path):
+    checkpoint = make_checkpoint(tmp_path)
+    with checkpoint.lock():
+        checkpoint.save_extracted([])
+    IngestionCheckpoint.purge_stale(str(tmp_path), max_age_seconds=3600)
+    assert os.path.isdir(checkpoint.path)
+
+    old = time.time() - 7200
+    os.utime(checkpoint.path, (old, old))
+    IngestionCheckpoint.purge_stale(str(tmp_path), max_age_seconds=3600)
+    assert not os.path.exists(checkpoint.path)
+
+
+def test_key_depends_on_content_and_parameters():
+    key = IngestionCheckpoint.make_key("hash", index_name="a")
+    assert key == IngestionCheckpoint.make_key("hash", index_name="a")
+    assert key != IngestionCheckpoint.make_key("hash", index_name="b")
+    assert key != IngestionCheckpoint.make_key("other", index_name="a")
+
+
+def test_stream_and_file_hashes_match(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_bytes(b"content")
+    stream = io.BytesIO(b"content")
+    assert stream_sha256(stream) == file_sha256(str(path))
+    assert stream.tell() == 0
+
+
+def test_lock_is_touched_when_acquired(tmp_path):
+    checkpoint = make_checkpoint(tmp_path)
+    with checkpoint.lock():
+        pass
+    old = time.time() - 7200
+    os.utime(checkpoint.lock_path, (old, old))
+    with checkpoint.lock():
+        IngestionCheckpoint.purge_stale(str(tmp_path), max_age_seconds=3600)
+        assert os.path.exists(checkpoint.lock_path)
+
+
+def test_waiting_duplicate_sees_completion(tmp_path):
+    checkpoint = make_checkpoint(tmp_path)
+    started = time.time()
+    assert not checkpoint.completed_since(started)
+    with checkpoint.lock():
+        checkpoint.save_extracted([])
+        checkpoint.mark_completed()
+    assert not os.path.exists(checkpoint.path)
+    assert checkpoint.completed_since(started)
+    # a later upload of the same document is a new ingestion
+    assert not checkpoint.completed_since(time.time() + 1)
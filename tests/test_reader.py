@@ -0,0 +1,105 @@
+import base64
+from io import BytesIO
+import pytest
+from PIL import Image, ImageDraw
+from src.utils.reader import (PageProcessingError, plan_batches, prepare_page,
+                              process_document_images, split_batch_response)
+
+
+class FlakyVisionService:
+    """Fails every call whose image data is in `failing`."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = 0
+
+    def invoke(self, messages, **kwargs):
+        self.calls += 1
+        url = messages[-1]["content"][0]["image_url"]["url"]
+        if any(url.endswith(marker) for marker in self.failing):
+            raise RuntimeError("429 Too Many Requests")
+        return "text of " + url[-1]
+
+
+def pages(*markers):
+    return [{"type": "image", "content": marker} for marker in markers]
+
+
+def test_failed_pages_raise_after_good_pages_are_reported():
+    done = {}
+    service = FlakyVisionService(failing={"b"})
+    with pytest.raises(PageProcessingError) as excinfo:
+        process_document_images(pages("a", "b", "c"), service, adaptive=False,
+                                on_page_done=lambda idx, text: done.update({idx: text}))
+    assert set(excinfo.value.errors) == {2}
+    assert done == {1: "text of a", 3: "text of c"}
+
+
+def test_resume_only_reads_missing_pages():
+    service = FlakyVisionService()
+    text = process_document_images(pages("a", "b", "c"), service, adaptive=False,
+                                   completed_pages={1: "text of a", 3: "text of c"})
+    assert service.calls == 1
+    assert text == "text of a\ntext of b\ntext of c"
+
+
+def page_image(lines=0):
+    img = Image.new("RGB", (1240, 1754), "white")
+    draw = ImageDraw.Draw(img)
+    for i in range(lines):
+        draw.rectangle((150, 200 + 40 * i, 550, 215 + 40 * i), fill="black")
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def test_only_empty_pages_are_sent_at_low_detail():
+    assert prepare_page(page_image(0), 1)["profile"] == "blank"
+    # a single line, e.g. a signature or annex title page
+    assert prepare_page(page_image(1), 1)["profile"] == "light"
+    assert prepare_page(page_image(40), 1)["profile"] == "dense"
+
+
+def test_pages_with_text_keep_full_resolution():
+    for lines in (1, 2, 40):
+        page = prepare_page(page_image(lines), 1)
+        img = Image.open(BytesIO(base64.b64decode(page["url"].split(",", 1)[1])))
+        assert min(img.size) == 768 and page["detail"] == "high"
+
+
+def test_only_sparse_pages_are_packed():
+    # a few lines of text is already a regular page, read on its own
+    assert prepare_page(page_image(6), 1)["profile"] == "dense"
+
+
+def test_plan_batches_packs_light_pages_and_isolates_dense_ones():
+    pages = [{"index": i, "profile": profile}
+             for i, profile in enumerate(["light", "dense", "blank", "light", "light", "light"], start=1)]
+    batches = plan_batches(pages, max_pages_per_request=3)
+    assert [[page["index"] for page in batch] for batch in batches] == [[2], [1, 3, 4], [5, 6]]
+
+
+def test_split_batch_response_keeps_expected_pages_only():
+    response = "### PAGE 1\nfirst\n### PAGE 9\nstray\n### PAGE 2\nsecond\n"
+    assert split_batch_response(response, [1, 2]) == {1: "first", 2: "second"}
+    assert split_batch_response("no markers", [1]) == {}
+
+
+class PackedVisionService:
+    """Answers packed requests without page 2; reading page 2 alone fails."""
+
+    def invoke(self, messages, **kwargs):
+        labels = [part["text"] for part in messages[-1]["content"] if part["type"] == "text"]
+        if not labels:
+            raise RuntimeError("500 Internal Server Error")
+        return "\n".join(f"{label}\ntext" for label in labels if label != "### PAGE 2")
+
+
+def test_fallback_failure_keeps_pages_already_read():
+    done = {}
+    with pytest.raises(PageProcessingError) as excinfo:
+        process_document_images([{"type": "image", "content": page_image(1)} for _ in range(3)],
+                                PackedVisionService(),
+                                on_page_done=lambda idx, text: done.update({idx: text}))
+    assert set(excinfo.value.errors) == {2}
+    assert done == {1: "text", 3: "text"}
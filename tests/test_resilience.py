@@ -0,0 +1,222 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.services.resilience import (
+    BudgetExhaustedError,
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilienceLayer,
+    is_transient,
+    request_budget,
+    retry_after,
+)
+
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(headers or {})
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+
+def test_breaker_opens_after_threshold_and_half_opens_after_reset():
+    breaker = CircuitBreaker("d", failure_threshold=2, reset_timeout=0.05)
+    open_breaker(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # only one trial at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker("d", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.parametrize("error, expected", [
+    (TimeoutError(), True),
+    (ConnectionError(), True),
+    (StatusError(429), True),
+    (StatusError(503), True),
+    (StatusError(400), False),
+    (ValueError(), False),
+])
+def test_is_transient(error, expected):
+    assert is_transient(error) is expected
+
+
+def test_transient_error_fails_over_to_next_deployment():
+    layer = ResilienceLayer(failure_threshold=1, max_retries=0)
+
+    def fn(deployment, timeout):
+        if deployment == "primary":
+            raise StatusError(503)
+        return deployment
+
+    assert layer.call("op", ["primary", "fallback"], fn, default_timeout=1) == "fallback"
+    assert layer.breaker("primary").state == CircuitBreaker.OPEN
+
+
+def test_non_transient_error_is_raised_without_touching_breakers():
+    layer = ResilienceLayer(failure_threshold=1)
+    seen = []
+
+    def fn(deployment, timeout):
+        seen.append(deployment)
+        raise StatusError(400)
+
+    for _ in range(3):
+        with pytest.raises(StatusError):
+            layer.call("op", ["primary", "fallback"], fn, default_timeout=1)
+    assert seen == ["primary"] * 3
+    assert layer.breaker("primary").state == CircuitBreaker.CLOSED
+
+
+def test_transient_errors_are_retried_within_the_layer():
+    layer = ResilienceLayer(failure_threshold=10, max_retries=2, retry_backoff=0)
+    attempts = []
+
+    def fn(deployment, timeout):
+        attempts.append(deployment)
+        if len(attempts) < 3:
+            raise TimeoutError()
+        return "ok"
+
+    assert layer.call("op", ["primary"], fn, default_timeout=1) == "ok"
+    assert len(attempts) == 3
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after-ms": "250"}, 0.25),
+    ({"retry-after": "2"}, 2.0),
+    ({"retry-after": "Thu, 01 Jan 1970 00:00:00 GMT"}, 0.0),
+    ({}, None),
+])
+def test_retry_after(headers, expected):
+    assert retry_after(StatusError(429, headers)) == expected
+
+
+def test_throttling_does_not_open_breaker():
+    layer = ResilienceLayer(failure_threshold=2, max_retries=1, retry_backoff=0)
+
+    def throttled(deployment, timeout):
+        raise StatusError(429, {"retry-after-ms": "0"})
+
+    for _ in range(5):
+        with pytest.raises(StatusError):
+            layer.call("op", ["primary"], throttled, default_timeout=1)
+    breaker = layer.breaker("primary")
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()["throttles"] == 10
+    assert layer.call("op", ["primary"], lambda d, t: "ok", default_timeout=1) == "ok"
+
+
+def test_throttled_call_waits_for_retry_after():
+    layer = ResilienceLayer(max_retries=1, retry_backoff=0)
+    attempts = []
+
+    def fn(deployment, timeout):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise StatusError(429, {"retry-after-ms": "200"})
+        return "ok"
+
+    assert layer.call("op", ["primary"], fn, default_timeout=1) == "ok"
+    assert attempts[1] - attempts[0] >= 0.2
+
+
+def test_retry_after_beyond_budget_fails_fast():
+    layer = ResilienceLayer(max_retries=2, retry_backoff=0)
+
+    def throttled(deployment, timeout):
+        raise StatusError(429, {"retry-after": "5"})
+
+    start = time.monotonic()
+    with request_budget(1):
+        with pytest.raises(StatusError):
+            layer.call("op", ["primary"], throttled, default_timeout=1)
+    assert time.monotonic() - start < 0.5
+
+
+def test_all_breakers_open_raises_circuit_open():
+    layer = ResilienceLayer(failure_threshold=1)
+    open_breaker(layer.breaker("primary"))
+    with pytest.raises(CircuitOpenError):
+        layer.call("op", ["primary"], lambda d, t: "ok", default_timeout=1)
+
+
+def test_exhausted_budget_does_not_strand_half_open_trial():
+    layer = ResilienceLayer(failure_threshold=1, reset_timeout=0.01)
+    open_breaker(layer.breaker("primary"))
+    time.sleep(0.02)
+    with request_budget(0):
+        with pytest.raises(BudgetExhaustedError):
+            layer.call("op", ["primary"], lambda d, t: "ok", default_timeout=1)
+    assert layer.call("op", ["primary"], lambda d, t: "ok", default_timeout=1) == "ok"
+    assert layer.breaker("primary").state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_async_trial_is_released():
+    layer = ResilienceLayer(failure_threshold=1, reset_timeout=0.01)
+    open_breaker(layer.breaker("primary"))
+    time.sleep(0.02)
+
+    async def slow(deployment, timeout):
+        await asyncio.sleep(10)
+
+    async def fast(deployment, timeout):
+        return "ok"
+
+    async def scenario():
+        task = asyncio.ensure_future(layer.acall("op", ["primary"], slow, default_timeout=10))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await layer.acall("op", ["primary"], fast, default_timeout=1)
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_unhedged_call_runs_on_callers_thread():
+    layer = ResilienceLayer()
+    caller = threading.current_thread()
+    ran_on = layer.call("op", ["d"], lambda d, t: threading.current_thread(), default_timeout=1, hedge=True)
+    assert ran_on is caller
+
+
+def test_slow_primary_is_hedged():
+    layer = ResilienceLayer(hedge_min_samples=5)
+    for _ in range(5):
+        layer.call("op", ["d"], lambda d, t: time.sleep(0.01), default_timeout=5, hedge=True)
+    calls = []
+
+    def fn(deployment, timeout):
+        calls.append(1)
+        time.sleep(1 if len(calls) == 1 else 0.01)
+        return len(calls)
+
+    start = time.monotonic()
+    assert layer.call("op", ["d"], fn, default_timeout=5, hedge=True) == 2
+    assert time.monotonic() - start < 0.5
+    assert layer.stats()["hedging"]["op"]["hedge_wins"] == 1
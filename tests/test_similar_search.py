@@ -0,0 +1,82 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from pydantic import ValidationError
+from src.functions.similar_search import reciprocal_rank_fusion, similar_search
+from src.models.models import MAX_QUERY_INDEXES, QuestionRequest
+from src.utils import Settings
+
+
+def hit(doc_id):
+    return {"id": doc_id, "textual_content": doc_id.upper()}
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, prompt):
+        self.calls += 1
+        return [[0.0, 1.0]]
+
+
+class FakeSearch:
+    def __init__(self, results, failing=()):
+        self.embedding_model = FakeEmbedder()
+        self.results = results
+        self.failing = set(failing)
+
+    def get_similar(self, index_name, query, top_k=5, filter=None, vector=None):
+        if index_name in self.failing:
+            raise RuntimeError(f"index {index_name} not found")
+        return self.results[index_name][:top_k]
+
+
+def test_rrf_prefers_hits_ranked_by_several_lists():
+    fused = reciprocal_rank_fusion([[hit("a"), hit("b")], [hit("b"), hit("c")]], top_k=2)
+    assert [h["id"] for h in fused] == ["b", "a"]
+
+
+def test_rrf_truncates_to_top_k():
+    assert len(reciprocal_rank_fusion([[hit(str(i)) for i in range(10)]], top_k=3)) == 3
+
+
+def test_fan_out_embeds_once_and_fuses():
+    search = FakeSearch({"x": [hit("a")], "y": [hit("b")]})
+    text = similar_search(search, "q", ["x", "y"], top_k=5)
+    assert search.embedding_model.calls == 1
+    assert set(text.split()) == {"A", "B"}
+
+
+def test_fan_out_skips_failing_index():
+    search = FakeSearch({"x": [hit("a")]}, failing={"y"})
+    assert similar_search(search, "q", ["x", "y"], top_k=5) == "A"
+
+
+def test_fan_out_raises_when_every_index_fails():
+    search = FakeSearch({}, failing={"x", "y"})
+    with pytest.raises(RuntimeError):
+        similar_search(search, "q", ["x", "y"], top_k=5)
+
+
+@pytest.mark.parametrize("index_name", [[], ["i"] * (MAX_QUERY_INDEXES + 1)])
+def test_question_request_bounds_index_list(index_name):
+    with pytest.raises(ValidationError):
+        QuestionRequest(question="q", index_name=index_name)
+
+
+class SlowSearch(FakeSearch):
+    def get_similar(self, index_name, query, top_k=5, filter=None, vector=None):
+        time.sleep(0.2)
+        return [hit(index_name)]
+
+
+def test_fan_out_at_admission_limit_does_not_queue():
+    search = SlowSearch({})
+    concurrency = Settings().query_max_concurrency
+    indexes = [str(i) for i in range(MAX_QUERY_INDEXES)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda _: similar_search(search, "q", indexes), range(concurrency)))
+    # every search runs at once: about one search latency, not several
+    assert time.perf_counter() - start < 0.6
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import fitz
+import numpy as np
+import pytest
+from azure.core.exceptions import HttpResponseError
+from src.functions.vsearch import upload_documents
+from src.services import azai_search
+from src.services.azai_search import AzureSearchService
+from src.utils import Settings
+from src.utils.checkpoint import IngestionCheckpoint
+from src.utils.reader import PageProcessingError
+
+PAGES = 3
+# enough OCR text for two upload batches of 100 chunks
+PAGE_TEXT = "x" * 70000
+
+
+class FlakyOpenAIService:
+    """Vision and embedding stand-in failing the call numbers listed in `fail_ocr` / `fail_embed`."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ocr_calls = 0
+        self.embed_calls = 0
+        self.fail_ocr = set()
+        self.fail_embed = set()
+
+    def invoke(self, messages, **kwargs):
+        with self.lock:
+            self.ocr_calls += 1
+            call = self.ocr_calls
+        if call in self.fail_ocr:
+            raise RuntimeError("500 Internal Server Error")
+        return PAGE_TEXT
+
+    def embed(self, prompt):
+        self.embed_calls += 1
+        if self.embed_calls in self.fail_embed:
+            raise RuntimeError("500 Internal Server Error")
+        return [np.ones(3, dtype=np.float32)]
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.reason = "Service Unavailable" if status_code == 503 else "OK"
+        self.headers = {}
+        self.content = json.dumps(body).encode("utf-8")
+
+    def text(self, encoding=None):
+        return self.content.decode("utf-8")
+
+
+class FlakyPipeline:
+    """Index endpoint stand-in recording the ids of every request and failing request `fail_request`."""
+
+    def __init__(self):
+        self.requests = []
+        self.fail_request = None
+
+    def send_request(self, request, **kwargs):
+        ids = [doc["id"] for doc in json.loads(request.content)["value"]]
+        self.requests.append(ids)
+        if len(self.requests) == self.fail_request:
+            return FakeResponse(503, {"error": {"message": "unavailable"}})
+        return FakeResponse(200, {"value": [{"key": i, "status": True, "statusCode": 201} for i in ids]})
+
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "contract.pdf"
+    pdf = fitz.open()
+    for _ in range(PAGES):
+        page = pdf.new_page()
+        # dense pages, so each one is read in its own call
+        for y in range(40, 800, 20):
+            page.draw_rect(fitz.Rect(40, y, 560, y + 10), color=(0, 0, 0), fill=(0, 0, 0))
+    pdf.save(str(path))
+    return str(path)
+
+
+def test_failed_ingestion_resumes_from_last_completed_unit(tmp_path, document, monkeypatch):
+    monkeypatch.setattr(azai_search, "INDEX_ITEM_RETRY_BACKOFF", 0)
+    checkpoint_dir = str(tmp_path / "checkpoints")
+    openai_service = FlakyOpenAIService()
+    search_service = AzureSearchService(embedding_model=openai_service,
+                                        sets=Settings(azure_ai_search_endpoint="https://search.test",
+                                                      azure_ai_search_key="key"))
+    search_service.pipeline_client = FlakyPipeline()
+
+    def ingest():
+        upload_documents(index_name="idx",
+                         document=document,
+                         openai_service=openai_service,
+                         azure_search_service=search_service,
+                         processing_mode="quality",
+                         checkpoint_dir=checkpoint_dir)
+
+    # 1. one OCR page fails: the other pages are kept
+    openai_service.fail_ocr = {1}
+    with pytest.raises(PageProcessingError):
+        ingest()
+    assert openai_service.ocr_calls == PAGES
+
+    # 2. only the failed page is read again; an embedding fails halfway
+    openai_service.fail_embed = {50}
+    with pytest.raises(RuntimeError):
+        ingest()
+    assert openai_service.ocr_calls == PAGES + 1
+    assert openai_service.embed_calls == 50
+
+    # 3. embeddings resume after the 49 saved ones; the second upload batch fails
+    search_service.pipeline_client.fail_request = 2
+    with pytest.raises(HttpResponseError):
+        ingest()
+    chunks = openai_service.embed_calls - 50 + 49
+    assert chunks > 100
+    first_batch, failed_batch = search_service.pipeline_client.requests
+
+    # 4. nothing is recomputed and only the failed batch is sent again, with the same ids
+    embed_calls = openai_service.embed_calls
+    ingest()
+    assert openai_service.ocr_calls == PAGES + 1
+    assert openai_service.embed_calls == embed_calls
+    assert search_service.pipeline_client.requests == [first_batch, failed_batch, failed_batch]
+    assert len(first_batch) + len(failed_batch) == chunks
+
+    checkpoint = IngestionCheckpoint(checkpoint_dir, os.listdir(checkpoint_dir)[0].split(".")[0])
+    assert not os.path.exists(checkpoint.path)
+    assert os.path.exists(checkpoint.done_path)